@@ -0,0 +1,64 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : json_codecs.py
+
+"""
+Measure the decode throughput of the JSON codecs of base_lib on event.get responses, and the encode time of payloads.
+The responses are the bytes of JSON-RPC responses of the mock Zabbix API, with tags, in the shape of Zabbix v4 and
+above, so that each codec decodes them from bytes as ConnectionWithZabbix does. The codecs not installed are skipped.
+Run it from anywhere, e.g. python benchmarks/json_codecs.py --events 50000 --repeat 5
+"""
+
+import argparse
+import json
+import os
+import sys
+import timeit
+
+from mock_zabbix import MockZabbixData
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Build the response of event.get for the events of the mock, as the bytes received from Zabbix.
+def build_response_body(number_of_events):
+    mock_data = MockZabbixData(number_of_events)
+    return json.dumps({'jsonrpc': '2.0', 'result': mock_data.events, 'id': 1}).encode('utf-8')
+
+
+# Time the best of repeat runs of function. Return the secs of the best run.
+def best_time(function, repeat):
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure the throughput of the JSON codecs.')
+    parser.add_argument('--events', type=int, default=20000, help='Number of events per response. Default: 20000.')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of runs, of which the best one. Default: 5.')
+    args = parser.parse_args()
+
+    # base_lib loads the config file of the repository when it is imported, and logs to its log folder.
+    os.chdir(REPO_DIR)
+    sys.path.insert(0, REPO_DIR)
+    from modules import base_lib
+
+    response_body = build_response_body(args.events)
+    python_payload = {'jsonrpc': '2.0', 'method': 'event.get', 'auth': '0123456789abcdef', 'id': 1,
+                      'params': {'output': 'extend', 'selectTags': 'extend', 'selectAcknowledges': 'extend',
+                                 'eventids': [str(1000000 + 2 * index) for index in range(1000)]}}
+    print('%d events, %.1f MiB per response' % (args.events, len(response_body) / 2 ** 20))
+    baseline_secs = None
+    # The json of the standard library first, as the baseline of the others.
+    for json_codec in sorted(base_lib.JSON_CODECS.values(), key=lambda codec: codec is not base_lib.JsonCodec):
+        if not json_codec.is_available():
+            print('%-9s not installed' % json_codec.name)
+            continue
+        if json_codec.loads(response_body) != json.loads(response_body):
+            raise Exception('The codec %s decodes the response differently.' % json_codec.name)
+        decode_secs = best_time(lambda: json_codec.loads(response_body), args.repeat)
+        encode_secs = best_time(lambda: json_codec.dumps(python_payload), args.repeat)
+        if json_codec is base_lib.JsonCodec:
+            baseline_secs = decode_secs
+        print('%-9s decode %8.1f MiB/s, %10.1f events/s, %.2fx json, encode %.1f us per payload'
+              % (json_codec.name, len(response_body) / 2 ** 20 / decode_secs, args.events / decode_secs,
+                 baseline_secs / decode_secs, encode_secs * 1e6))
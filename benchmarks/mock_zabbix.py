@@ -0,0 +1,237 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : mock_zabbix.py
+
+"""
+A local stand-in of Zabbix api_jsonrpc.php for benchmarks, serving synthetic events, problems and triggers.
+It answers apiinfo.version, user.login, user.logout, user.checkAuthentication, event.get, problem.get and trigger.get,
+one by one or in JSON-RPC batches, in the response shapes of Zabbix v3 (no event name and severity) or v4 and above.
+With --compress, the responses are compressed with gzip for the clients which accept it, as the web server of Zabbix
+frontend does with mod_deflate or gzip of Nginx. The requests compressed with gzip are accepted either way.
+Run it standalone, e.g. python benchmarks/mock_zabbix.py --port 18080 --events 100000 --triggers 1000 --latency-ms 5
+
+Table of Content:
+    Section 1 - Synthetic Data
+    Section 2 - JSON-RPC Server
+"""
+
+import argparse
+import gzip
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+#####################################
+#    Section 1 - Synthetic Data     #
+#####################################
+# Define a class MockZabbixData to hold the synthetic events of a Zabbix version, one per interval secs from
+# time_from on. Two events out of three are resolved recovery_after secs later. The events are spread over
+# number_of_triggers triggers, i.e. the trigger fan-out of trigger.get lookups.
+class MockZabbixData:
+    def __init__(self, number_of_events, number_of_triggers=100, api_version='5.0.3', time_from=1600000000,
+                 interval=60, recovery_after=90037):
+        self.api_version = api_version
+        self.version_tuple = tuple(int(part) for part in api_version.split('.')[:2])
+        self.time_from = time_from
+        self.time_till = time_from + interval * number_of_events
+        self.triggers = {}
+        for index in range(number_of_triggers):
+            triggerid = str(10000 + index)
+            self.triggers[triggerid] = {
+                'triggerid': triggerid, 'description': 'Trigger %d on {HOST.NAME}' % index, 'priority': str(index % 6),
+                'templateid': '0', 'tags': [],
+                'hosts': [{'hostid': str(20000 + index % 50), 'name': 'host-%d' % (index % 50)}],
+                'groups': [{'groupid': '2', 'name': 'Linux servers'}, {'groupid': str(3 + index % 5),
+                                                                       'name': 'Group %d' % (index % 5)}]
+            }
+        triggerids = list(self.triggers)
+        self.events = []
+        # The clocks of recovery events, r_eventid -> clock.
+        self.r_clocks = {}
+        for index in range(number_of_events):
+            eventid = 1000000 + 2 * index
+            clock = time_from + index * interval
+            resolved = index % 3 != 0
+            zbx_event = {
+                'eventid': str(eventid), 'source': '0', 'object': '0', 'objectid': triggerids[index % len(triggerids)],
+                'clock': str(clock), 'ns': '0', 'value': '1', 'acknowledged': str(index % 2),
+                'r_eventid': str(eventid + 1) if resolved else '0', 'c_eventid': '0', 'correlationid': '0',
+                'userid': '0', 'tags': [{'tag': 'type', 'value': 'T%d' % (index % 4)}, {'tag': 'app', 'value': 'db'}],
+                'acknowledges': []
+            }
+            # Zabbix v4 and above give the name and severity of events.
+            if self.version_tuple >= (4, 0):
+                zbx_event.update({'name': 'Problem %d' % index, 'severity': str(index % 6), 'suppressed': '0',
+                                  'opdata': ''})
+            if resolved:
+                self.r_clocks[zbx_event['r_eventid']] = str(clock + recovery_after)
+            self.events.append(zbx_event)
+
+    # Get the events in the timeframe, from eventid_from on, as event.get does.
+    def _filter_events(self, params):
+        zbx_events = self.events
+        if 'time_from' in params or 'time_till' in params:
+            time_from = int(params.get('time_from', 0))
+            time_till = int(params.get('time_till', 2 ** 62))
+            zbx_events = [zbx_event for zbx_event in zbx_events if time_from <= int(zbx_event['clock']) <= time_till]
+        if 'eventid_from' in params:
+            zbx_events = [zbx_event for zbx_event in zbx_events
+                          if int(zbx_event['eventid']) >= int(params['eventid_from'])]
+        return zbx_events
+
+    def event_get(self, params):
+        if 'eventids' in params:
+            # The lookups of recovery events.
+            eventids = params['eventids'] if isinstance(params['eventids'], list) else [params['eventids']]
+            return [{'eventid': eventid, 'clock': self.r_clocks[eventid]} for eventid in eventids
+                    if eventid in self.r_clocks]
+        zbx_events = self._filter_events(params)
+        if params.get('countOutput'):
+            return str(len(zbx_events))
+        return zbx_events
+
+    def problem_get(self, params):
+        problems = []
+        for zbx_event in self._filter_events(params):
+            problem = dict(zbx_event, r_clock=self.r_clocks.get(zbx_event['r_eventid'], '0'))
+            # Zabbix v3 does not give the acknowledgement of problems.
+            if self.version_tuple < (4, 0):
+                del problem['acknowledged']
+            problems.append(problem)
+        return problems
+
+    def trigger_get(self, params):
+        triggerids = params.get('triggerids', [])
+        triggerids = triggerids if isinstance(triggerids, list) else [triggerids]
+        return [self.triggers[str(triggerid)] for triggerid in triggerids if str(triggerid) in self.triggers]
+
+    def user_login(self, params):
+        # The parameter 'user' is renamed 'username' since Zabbix 5.4.
+        username_param = 'username' if self.version_tuple >= (5, 4) else 'user'
+        if username_param not in params or 'password' not in params:
+            raise ValueError('Invalid parameter "/": the parameter "%s" is missing.' % username_param)
+        return 'mock-session-0123456789abcdef'
+
+    def user_check_authentication(self, params):
+        if params.get('sessionid') != 'mock-session-0123456789abcdef':
+            raise ValueError('Session terminated, re-login, please.')
+        return {'userid': '1', 'sessionid': params['sessionid']}
+
+    # Get the result of a JSON-RPC request.
+    def handle(self, method, params):
+        handlers = {
+            'apiinfo.version': lambda _: self.api_version,
+            'user.login': self.user_login,
+            'user.logout': lambda _: True,
+            'user.checkAuthentication': self.user_check_authentication,
+            'event.get': self.event_get,
+            'problem.get': self.problem_get,
+            'trigger.get': self.trigger_get
+        }
+        if method not in handlers:
+            raise ValueError('Incorrect method "%s".' % method)
+        return handlers[method](params or {})
+
+
+#####################################
+#    Section 2 - JSON-RPC Server    #
+#####################################
+# Define a class MockZabbixHandler to answer the JSON-RPC requests, one object or a batch array per HTTP request.
+class MockZabbixHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def _answer(self, request):
+        self.server.count_call(request.get('method'))
+        try:
+            return {'jsonrpc': '2.0', 'result': self.server.data.handle(request.get('method'), request.get('params')),
+                    'id': request.get('id')}
+        except ValueError as error:
+            return {'jsonrpc': '2.0', 'error': {'code': -32602, 'message': 'Invalid params.', 'data': str(error)},
+                    'id': request.get('id')}
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        if self.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        body = json.loads(body)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if isinstance(body, list):
+            response = [self._answer(request) for request in body]
+        else:
+            response = self._answer(body)
+        content = json.dumps(response).encode('utf-8')
+        compressed = self.server.compress and 'gzip' in self.headers.get('Accept-Encoding', '')
+        if compressed:
+            content = gzip.compress(content, compresslevel=6)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if compressed:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    # ConnectionWithZabbix sends the JSON-RPC requests with GET.
+    do_GET = do_POST
+
+
+# Define a class MockZabbixServer to serve MockZabbixData, with latency secs added to every HTTP request, and to
+# count the JSON-RPC calls per method. With compress, the responses are compressed with gzip if the client accepts it.
+class MockZabbixServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, data, latency=0.0, host='127.0.0.1', port=0, compress=False):
+        super().__init__((host, port), MockZabbixHandler)
+        self.data = data
+        self.latency = latency
+        self.compress = compress
+        self.calls = {}
+        self._calls_lock = threading.Lock()
+
+    @property
+    def url(self):
+        return 'http://%s:%d/api_jsonrpc.php' % self.server_address[:2]
+
+    def count_call(self, method):
+        with self._calls_lock:
+            self.calls[method] = self.calls.get(method, 0) + 1
+
+    # Get the calls counted so far, and start counting again.
+    def reset_calls(self):
+        with self._calls_lock:
+            (calls, self.calls) = (self.calls, {})
+        return calls
+
+    # Serve in a daemon thread, and return at once.
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='mock-zabbix', daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serve a mock Zabbix JSON-RPC API with synthetic events.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=18080)
+    parser.add_argument('--events', type=int, default=10000, help='Number of events. Default: 10000.')
+    parser.add_argument('--triggers', type=int, default=100, help='Number of triggers. Default: 100.')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Latency added per HTTP request. Default: 0.')
+    parser.add_argument('--api-version', default='5.0.3', help='Zabbix API version, e.g. 3.4.15, 4.0.30 or 5.0.3.')
+    parser.add_argument('--compress', action='store_true', help='Compress the responses with gzip.')
+    args = parser.parse_args()
+
+    mock_data = MockZabbixData(args.events, args.triggers, args.api_version)
+    server = MockZabbixServer(mock_data, args.latency_ms / 1000, args.host, args.port, args.compress)
+    print('Serving Zabbix API %s at %s, events from %s to %s.' % (
+        args.api_version, server.url, time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(mock_data.time_from)),
+        time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(mock_data.time_till))))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print('Calls: %s' % json.dumps(server.calls))
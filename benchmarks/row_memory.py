@@ -0,0 +1,104 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : row_memory.py
+
+"""
+Measure the memory footprint per exported event row, with tracemalloc.
+    before - the event dict from Zabbix, enriched in place and pruned to HEADERS, as EventToExport used to do.
+    after  - the EventRow built from the event dict, which is left as it is.
+Run it from the root of the repository, e.g. python benchmarks/row_memory.py --events 100000
+"""
+
+import argparse
+import copy
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import event_export_csv
+
+
+#####################################
+#          Synthetic Events         #
+#####################################
+# Build events and triggers in the shape of event.get and trigger.get results of Zabbix v4 or above.
+def build_zbx_events(number_of_events):
+    zbx_events = []
+    for index in range(number_of_events):
+        eventid = 1000 + 2 * index
+        zbx_events.append({
+            'eventid': str(eventid), 'source': '0', 'object': '0', 'objectid': str(100 + index % 50),
+            'clock': str(1600000000 + index * 60), 'ns': '0', 'value': '1', 'acknowledged': str(index % 2),
+            'name': 'Problem %d on the host' % index, 'severity': str(index % 6),
+            'r_eventid': str(eventid + 1) if index % 3 else '0', 'c_eventid': '0', 'correlationid': '0',
+            'userid': '0', 'suppressed': '0', 'opdata': '',
+            'tags': [{'tag': 'type', 'value': 'T%d' % (index % 3)}, {'tag': 'app', 'value': 'web'}],
+            'acknowledges': [], 'urls': []
+        })
+    return zbx_events
+
+
+# Fill the trigger and recovery event lookups in advance, as EventsTriggers and EventsRecoveryClocks do.
+def build_lookups(zbx_events):
+    events_triggers = event_export_csv.EventsTriggers(None, None, 1)
+    for objectid in {zbx_event['objectid'] for zbx_event in zbx_events}:
+        events_triggers.triggers[objectid] = {
+            'triggerid': objectid, 'description': 'Trigger %s' % objectid, 'priority': '3',
+            'hosts': [{'hostid': '1', 'name': 'host-%s' % objectid}],
+            'groups': [{'groupid': '2', 'name': 'Linux servers'}, {'groupid': '3', 'name': 'Web'}]
+        }
+    events_recovery_clocks = event_export_csv.EventsRecoveryClocks(None, None, 1)
+    for zbx_event in zbx_events:
+        if zbx_event['r_eventid'] != '0':
+            events_recovery_clocks.r_clocks[zbx_event['r_eventid']] = str(int(zbx_event['clock']) + 3700)
+    return events_triggers, events_recovery_clocks
+
+
+#####################################
+#          Representations          #
+#####################################
+# The former representation: the event dict enriched in place, then pruned attribute by attribute against HEADERS.
+def to_pruned_dict(events_processing, zbx_event, events_triggers, events_recovery_clocks):
+    event_row = event_export_csv.EventToExport(events_processing, zbx_event, events_triggers,
+                                               events_recovery_clocks).process()
+    pruned_event = copy.copy(zbx_event)
+    pruned_event.update(event_row.as_dict())
+    for attribute in list(pruned_event):
+        if attribute not in event_export_csv.HEADERS:
+            del pruned_event[attribute]
+    return pruned_event
+
+
+def to_event_row(events_processing, zbx_event, events_triggers, events_recovery_clocks):
+    return event_export_csv.EventToExport(events_processing, zbx_event, events_triggers,
+                                          events_recovery_clocks).process()
+
+
+# Get the bytes allocated per row, for the rows held all together.
+def measure(representation, zbx_events, events_triggers, events_recovery_clocks):
+    events_processing = event_export_csv.EventsProcessingV4()
+    tracemalloc.start()
+    start_bytes = tracemalloc.get_traced_memory()[0]
+    rows = [representation(events_processing, zbx_event, events_triggers, events_recovery_clocks)
+            for zbx_event in zbx_events]
+    (end_bytes, peak_bytes) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rows
+    return (end_bytes - start_bytes) / len(zbx_events), (peak_bytes - start_bytes) / len(zbx_events)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Measure the memory footprint per exported event row.')
+    parser.add_argument('--events', type=int, default=100000, help='Number of events. Default: 100000.')
+    args = parser.parse_args()
+
+    events = build_zbx_events(args.events)
+    (triggers_index, recovery_clocks_index) = build_lookups(events)
+    (before_bytes, before_peak) = measure(to_pruned_dict, events, triggers_index, recovery_clocks_index)
+    (after_bytes, after_peak) = measure(to_event_row, events, triggers_index, recovery_clocks_index)
+    print('%d events' % args.events)
+    print('before (pruned dict): %7.1f bytes per row held, %7.1f bytes per row at peak' % (before_bytes, before_peak))
+    print('after  (EventRow):    %7.1f bytes per row held, %7.1f bytes per row at peak' % (after_bytes, after_peak))
+    print('saved: %.1f%% per row held' % (100 * (1 - after_bytes / before_bytes)))
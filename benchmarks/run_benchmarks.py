@@ -0,0 +1,179 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : run_benchmarks.py
+
+"""
+Benchmark the exporter against the local mock Zabbix API of mock_zabbix.py, without a live Zabbix.
+    end-to-end - event_export_csv.py run in a child process per Zabbix version, with a config file pointing at the mock
+                 by ZABBIX_API_CONFIG. Reports the wall time, events/sec, API calls per event and peak RSS.
+    micro      - ConnectionWithZabbix round trips, EventToExport.process and the CSV write, in this process.
+Run it from anywhere, e.g. python benchmarks/run_benchmarks.py --events 50000 --triggers 1000 --latency-ms 2
+The peak RSS needs os.wait4, i.e. Linux or another Unix.
+
+Table of Content:
+    Section 1 - Config
+    Section 2 - End-to-End Benchmark
+    Section 3 - Micro Benchmarks
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+import yaml
+
+from mock_zabbix import MockZabbixData, MockZabbixServer
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+#####################################
+#        Section 1 - Config         #
+#####################################
+# Write a config file for the mock, based on the one of the repository. The modules log warnings to a file only,
+# so that logging does not weigh on the figures. The caches are disabled, so that every run does the same API calls.
+def write_benchmark_config(work_dir, url):
+    with open(os.path.join(REPO_DIR, 'zabbix-api-config.yml'), mode='r') as config_file:
+        config = yaml.load(config_file.read(), Loader=yaml.SafeLoader)
+    config['user'] = {'username': 'Admin', 'password': 'zabbix', 'api_token': None}
+    config['api_url'] = url
+    config['trigger_cache']['enabled'] = False
+    config['token_cache']['enabled'] = False
+    config['logger_conf']['log_file_fullname'] = os.path.join(work_dir, 'zabbix-api.log')
+    config['logger_conf']['logging_conf_fullname'] = os.path.join(REPO_DIR, 'zabbix-api-logging.yml')
+    config['logger_conf']['payload_logging'] = 'summary'
+    config['logger_conf']['loggers'] = {module_name: 'warning_timedRotatingFile'
+                                        for module_name in config['logger_conf']['loggers']}
+    config_path = os.path.join(work_dir, 'zabbix-api-config.yml')
+    with open(config_path, mode='w') as config_file:
+        yaml.safe_dump(config, config_file)
+    return config_path
+
+
+#####################################
+#  Section 2 - End-to-End Benchmark #
+#####################################
+# Run event_export_csv.py for the historical events of the whole mock data, and measure it.
+def run_end_to_end(server, config_path, work_dir, exporter_args):
+    output_filename = os.path.join(work_dir, 'benchmark.csv')
+    answers = '%s\nHistory\n%s\n%s\n' % (
+        output_filename,
+        time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(server.data.time_from)),
+        time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(server.data.time_till)))
+    server.reset_calls()
+    with open(os.path.join(work_dir, 'exporter.log'), mode='w') as exporter_log:
+        start_time = timeit.default_timer()
+        process = subprocess.Popen([sys.executable, os.path.join(REPO_DIR, 'event_export_csv.py')] + exporter_args,
+                                   stdin=subprocess.PIPE, stdout=exporter_log, stderr=subprocess.STDOUT,
+                                   cwd=work_dir, env=dict(os.environ, ZABBIX_API_CONFIG=config_path))
+        process.stdin.write(answers.encode('utf-8'))
+        process.stdin.close()
+        # wait4 gives the resource usage of this very child, including its peak RSS.
+        (_, status, resource_usage) = os.wait4(process.pid, 0)
+        wall_time = timeit.default_timer() - start_time
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise Exception('The exporter exited with %d. Refer to %s for details.'
+                        % (process.returncode, os.path.join(work_dir, 'exporter.log')))
+    calls = server.reset_calls()
+    with open(output_filename, mode='rb') as output_file:
+        events = sum(1 for _ in output_file) - 1
+    return {
+        'events': events,
+        'wall_time': wall_time,
+        'events_per_sec': events / wall_time,
+        'calls': calls,
+        'calls_per_event': sum(calls.values()) / max(events, 1),
+        # ru_maxrss is in KiB on Linux.
+        'peak_rss_mib': resource_usage.ru_maxrss / 1024
+    }
+
+
+#####################################
+#   Section 3 - Micro Benchmarks    #
+#####################################
+# Time a function called number times. Return the secs per call.
+def time_per_call(function, number):
+    start_time = timeit.default_timer()
+    for _ in range(number):
+        function()
+    return (timeit.default_timer() - start_time) / number
+
+
+# Benchmark ConnectionWithZabbix, EventToExport.process and the CSV write in this process. The modules are imported
+# here, as they load the config file given by ZABBIX_API_CONFIG when they are imported.
+def run_micro_benchmarks(server, config_path, work_dir, round_trips):
+    os.environ['ZABBIX_API_CONFIG'] = config_path
+    sys.path.insert(0, REPO_DIR)
+    import event_export_csv
+    from modules import base_lib
+    from modules import apiinfo
+
+    results = {}
+    # HTTP round trips of apiinfo.version, over the pooled keep-alive connections.
+    payload = apiinfo.ApiinfoVersion(server.url)._generate_payload()
+    results['connection_round_trip_ms'] = 1000 * time_per_call(
+        lambda: base_lib.ConnectionWithZabbix(server.url, payload, 'apiinfo.version').connect_zabbix(), round_trips)
+
+    # EventToExport.process of every event, with the trigger and recovery event lookups filled in advance.
+    events_triggers = event_export_csv.EventsTriggers(server.url, None, 1)
+    events_triggers.triggers = dict(server.data.triggers)
+    events_recovery_clocks = event_export_csv.EventsRecoveryClocks(server.url, None, 1)
+    events_recovery_clocks.r_clocks = dict(server.data.r_clocks)
+    events_processing = event_export_csv.select_events_processing(apiinfo.ZabbixVersion(server.data.api_version))
+    zbx_events = server.data.events
+    start_time = timeit.default_timer()
+    event_rows = [event_export_csv.EventToExport(events_processing, zbx_event, events_triggers,
+                                                 events_recovery_clocks).process() for zbx_event in zbx_events]
+    results['process_events_per_sec'] = len(zbx_events) / (timeit.default_timer() - start_time)
+
+    # The CSV write of the rows.
+    start_time = timeit.default_timer()
+    event_export_csv.write_events(os.path.join(work_dir, 'micro.csv'), iter(event_rows))
+    results['csv_write_rows_per_sec'] = len(event_rows) / (timeit.default_timer() - start_time)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the exporter against a local mock Zabbix API.')
+    parser.add_argument('--events', type=int, default=20000, help='Number of events. Default: 20000.')
+    parser.add_argument('--triggers', type=int, default=500, help='Number of triggers. Default: 500.')
+    parser.add_argument('--latency-ms', type=float, default=2.0, help='Latency per HTTP request. Default: 2.')
+    parser.add_argument('--api-versions', default='3.4.15,4.0.30,5.0.3',
+                        help='Comma-separated Zabbix API versions to run end-to-end. Default: 3.4.15,4.0.30,5.0.3.')
+    parser.add_argument('--round-trips', type=int, default=500,
+                        help='Number of ConnectionWithZabbix round trips of the micro benchmark. Default: 500.')
+    parser.add_argument('--skip-micro', action='store_true', help='Run the end-to-end benchmark only.')
+    parser.add_argument('--compress', action='store_true',
+                        help='Let the mock compress the responses with gzip, as a web server configured to does.')
+    parser.add_argument('exporter_args', nargs=argparse.REMAINDER,
+                        help='Options of event_export_csv.py after --, e.g. -- --workers 4 --stream')
+    args = parser.parse_args()
+    exporter_options = [option for option in args.exporter_args if option != '--']
+
+    benchmark_dir = tempfile.mkdtemp(prefix='zabbix-api-benchmark-')
+    print('Working in %s, %d events, %d triggers, %.1f ms latency, exporter options: %s'
+          % (benchmark_dir, args.events, args.triggers, args.latency_ms, ' '.join(exporter_options) or 'none'))
+    mock_server = None
+    for api_version in args.api_versions.split(','):
+        mock_server = MockZabbixServer(MockZabbixData(args.events, args.triggers, api_version),
+                                       args.latency_ms / 1000, compress=args.compress).start()
+        benchmark_config_path = write_benchmark_config(benchmark_dir, mock_server.url)
+        result = run_end_to_end(mock_server, benchmark_config_path, benchmark_dir, exporter_options)
+        print('end-to-end v%-8s %7d events in %7.2f s: %9.1f events/s, %.4f API calls/event, peak RSS %.1f MiB, '
+              'calls %s' % (api_version, result['events'], result['wall_time'], result['events_per_sec'],
+                            result['calls_per_event'], result['peak_rss_mib'], result['calls']))
+        if api_version != args.api_versions.split(',')[-1]:
+            mock_server.shutdown()
+            mock_server.server_close()
+
+    # The micro benchmarks run against the mock of the last version.
+    if not args.skip_micro:
+        result = run_micro_benchmarks(mock_server, benchmark_config_path, benchmark_dir, args.round_trips)
+        print('micro ConnectionWithZabbix round trip: %.3f ms' % result['connection_round_trip_ms'])
+        print('micro EventToExport.process:          %.1f events/s' % result['process_events_per_sec'])
+        print('micro CSV write:                      %.1f rows/s' % result['csv_write_rows_per_sec'])
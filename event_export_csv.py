@@ -7,8 +7,15 @@
 import time
 import timeit
 import datetime
-import csv
-import re
+import logging
+import argparse
+import heapq
+import math
+import itertools
+import json
+import os
+
+import yaml
 
 from modules import base_lib
 from modules import apiinfo
@@ -16,6 +23,7 @@ from modules import user
 from modules import problem
 from modules import event
 from modules import trigger
+from modules import output_writer
 
 
 #####################################
@@ -35,9 +43,66 @@ ACKNOWLEDGED_MAPPING = {
     '1': 'Yes'
 }
 
+# The maximum number of triggerids in one trigger.get query.
+TRIGGER_CHUNK_SIZE = 500
+
+# The maximum number of r_eventids in one event.get query to resolve the clocks of recovery events.
+RECOVERY_CHUNK_SIZE = 1000
+
+# The number of events enriched together, sharing the trigger and recovery event lookups, before they are written.
+EXPORT_CHUNK_SIZE = 5000
+
+# The number of rows written to the CSV file between two flushes.
+FLUSH_INTERVAL = 1000
+
 HEADERS = ['eventid', 'r_eventid', 'severity', 'name', 'type', 'time', 'recovery_time', 'duration', 'duration_readable',
            'acknowledged', 'hosts', 'groups']
 
+# The types of the columns not strings, for the output formats with types, e.g. Parquet.
+COLUMN_TYPES = {
+    'time': 'timestamp',
+    'recovery_time': 'timestamp',
+    'duration': 'int'
+}
+
+
+#####################################
+#        Funcs Command Line         #
+#####################################
+# Parse the command line options. Without a job file, the rest of inputs are interactive.
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Export Zabbix events to a CSV file.')
+    parser.add_argument('--jobs', default=None, metavar='FILE',
+                        help='Run the export jobs of a YAML job file in one process, without interactive inputs '
+                             'other than a credential missing from the config file.')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Number of threads sending the queries (event.get shards, trigger and recovery event '
+                             'lookups) concurrently. Default: 1, i.e. one by one.')
+    parser.add_argument('--shard-size', type=int, default=None, metavar='SECS',
+                        help='Split the timeframe of historical events into shards of SECS seconds, '
+                             'one event.get per shard.')
+    parser.add_argument('--shard-events', type=int, default=None, metavar='N',
+                        help='Split the timeframe of historical events into shards of about N events each, '
+                             'based on the event count of the timeframe. Ignored if --shard-size is given.')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Export only the historical events newer than the last run, appending them to the CSV '
+                             'file. The progress is recorded in a checkpoint file next to the CSV file, which also '
+                             'lets a crashed run resume from the last committed rows.')
+    parser.add_argument('--stream', action='store_true',
+                        help='Parse the event.get and problem.get responses incrementally, and export the events while '
+                             'they are being received, keeping memory bounded. Shards are then got one after another.')
+    parser.add_argument('--columnar-time', action='store_true',
+                        help='Process the time, recovery time and duration of the events chunk by chunk, column by '
+                             'column.')
+    arguments = parser.parse_args()
+    if arguments.workers < 1:
+        parser.error('--workers must be 1 or more.')
+    if arguments.shard_size is not None and arguments.shard_size < 1:
+        parser.error('--shard-size must be 1 or more.')
+    if arguments.shard_events is not None and arguments.shard_events < 1:
+        parser.error('--shard-events must be 1 or more.')
+    return arguments
+
 
 #####################################
 #         Funcs Query Input         #
@@ -97,74 +162,130 @@ def input_event_timeframe():
     return from_time_stamp, till_time_stamp
 
 
+#####################################
+#       Class Events History        #
+#####################################
+# Define a class to get historical events by calling API event.get, with the timeframe split into shards.
+class EventsHistory:
+    def __init__(self, api_url, api_token, time_from, time_till, eventid_from, shard_size, shard_events, workers,
+                 stream, incremental=False):
+        self.api_url = api_url
+        self.api_token = api_token
+        # Zabbix takes whole seconds, and includes both time_from and time_till. time_from may be None, i.e. the
+        # events are only bounded by eventid_from.
+        self.time_from = None if time_from is None else int(time_from)
+        self.time_till = int(time_till)
+        # Only the events from this eventid on, or None for all the events of the timeframe.
+        self.eventid_from = eventid_from
+        # Fixed duration of shards in secs, or None.
+        self.shard_size = shard_size
+        # Expected number of events per shard, to size the shards by event density, or None.
+        self.shard_events = shard_events
+        # The number of threads sending the event.get queries concurrently.
+        self.workers = workers
+        # Parse the responses incrementally, yielding the events while they are being received.
+        self.stream = stream
+        # Get the events in the order of eventid, the high-water mark of incremental exports, instead of clock.
+        # An event received late by Zabbix, e.g. buffered by a proxy, has an older clock but a newer eventid.
+        self.incremental = incremental
+
+    # The parameters of event.get for a timeframe.
+    def _build_event_params(self, time_from, time_till):
+        event_params = {
+            'output': 'extend',
+            'time_till': time_till,
+            'value': [1, 2, 3],
+            'selectAcknowledges': 'extend',
+            'selectTags': 'extend',
+            'sortfield': ['eventid'] if self.incremental else ['clock', 'eventid'],
+            'sortorder': 'ASC'
+        }
+        if time_from is not None:
+            event_params['time_from'] = time_from
+        if self.eventid_from is not None:
+            event_params['eventid_from'] = self.eventid_from
+        return event_params
+
+    # Count the events in the whole timeframe, to size the shards by event density.
+    def _count_events(self):
+        count_params = {
+            'countOutput': True,
+            'time_till': self.time_till,
+            'value': [1, 2, 3]
+        }
+        if self.time_from is not None:
+            count_params['time_from'] = self.time_from
+        if self.eventid_from is not None:
+            count_params['eventid_from'] = self.eventid_from
+        inst_count = event.EventGet(self.api_url, self.api_token, count_params)
+        return int(inst_count.api_query())
+
+    # Split the timeframe into shards of (time_from, time_till), which do not overlap.
+    def _split_timeframe(self):
+        # Without a lower bound of time, there is nothing to split. Streamed shards are chained, which keeps the order
+        # of eventid only with one shard.
+        if self.time_from is None or (self.incremental and self.stream):
+            logger.info('The timeframe is not split into shards.')
+            return [(self.time_from, self.time_till)]
+        time_span = self.time_till - self.time_from + 1
+        if self.shard_size is not None:
+            shard_size = self.shard_size
+        elif self.shard_events is not None:
+            event_count = self._count_events()
+            shard_size = math.ceil(time_span / max(math.ceil(event_count / self.shard_events), 1))
+            logger.info('%d events in the timeframe, %d secs per shard.' % (event_count, shard_size))
+        else:
+            shard_size = time_span
+        shards = []
+        for shard_from in range(self.time_from, self.time_till + 1, shard_size):
+            shards.append((shard_from, min(shard_from + shard_size - 1, self.time_till)))
+        logger.info('The timeframe is split into %d shards.' % len(shards))
+        return shards
+
+    # Get the events of all the shards, as an iterator merging them in the order of clock and eventid, or of eventid
+    # if incremental.
+    def get(self):
+        shard_queries = [event.EventGet(self.api_url, self.api_token, self._build_event_params(shard_from, shard_till))
+                         for (shard_from, shard_till) in self._split_timeframe()]
+        # Streamed shards are got one after another. As they do not overlap, chaining them keeps the order.
+        if self.stream:
+            return itertools.chain.from_iterable(shard_query.api_query_iter() for shard_query in shard_queries)
+        # Shards are sent one per HTTP request, even when batches are enabled, to keep every request small.
+        shard_events = base_lib.api_query_concurrently(shard_queries, self.workers)
+        if self.incremental:
+            return heapq.merge(*shard_events, key=lambda zbx_event: int(zbx_event['eventid']))
+        return heapq.merge(*shard_events, key=lambda zbx_event: (int(zbx_event['clock']), int(zbx_event['eventid'])))
+
+
 #####################################
 #        Class Event's Time         #
 #####################################
-# Define a class to process the time, recover_time, duration of events.
+# Define a class to process the time, recover_time, duration of events, into the row to export.
 class EventsTime:
-    def __init__(self, pre_process_event, api_url, api_token):
+    def __init__(self, pre_process_event, event_row, events_recovery_clocks):
         self.event = pre_process_event
-        self.api_url = api_url
-        self.api_token = api_token
+        self.row = event_row
+        # The clocks of recovery events, resolved by EventsRecoveryClocks in advance.
+        self.events_recovery_clocks = events_recovery_clocks
+
+    # Fill the time attributes of the row, from the clocks of the event and of its recovery event, if any.
+    def _process_clocks(self, clock, r_clock):
+        self.row.time = base_lib.convert_to_datetime(int(clock))
+        if r_clock is not None:
+            self.row.duration = base_lib.calculate_time_delta(clock, r_clock)
+            self.row.duration_readable = base_lib.convert_to_readable_time(self.row.duration)
+            self.row.recovery_time = base_lib.convert_to_datetime(int(r_clock))
+        return self.row
 
     # A method to process the time for recent events - got from problem.get.
     def _process_recent_event_time(self):
-        logger.debug('Start to process time for the event.')
-        if not self.event['r_clock'] == '0':
-            logger.debug('The event does have a recovery time.')
-            self.event['duration'] = base_lib.calculate_time_delta(self.event['clock'], self.event['r_clock'])
-            logger.debug('Calculated event duration in secs: %s' % self.event['duration'])
-            self.event['duration_readable'] = base_lib.convert_to_readable_time(
-                base_lib.calculate_time_delta(self.event['clock'], self.event['r_clock']))
-            logger.debug('Calculated event duration in readable format: %s' % self.event['duration_readable'])
-            self.event['time'] = datetime.datetime.fromtimestamp(int(self.event['clock']))
-            logger.debug('Calculated event time: %s' % self.event['time'])
-            self.event['recovery_time'] = datetime.datetime.fromtimestamp(int(self.event['r_clock']))
-            logger.debug('Calculated event recovery time: %s' % self.event['recovery_time'])
-        else:
-            logger.debug('The event does NOT have a recovery time.')
-            self.event['duration'] = None
-            self.event['duration_readable'] = None
-            self.event['time'] = datetime.datetime.fromtimestamp(int(self.event['clock']))
-            logger.debug('Calculated event time: %s' % self.event['time'])
-            self.event['recovery_time'] = None
-        return self.event
+        r_clock = self.event['r_clock']
+        return self._process_clocks(self.event['clock'], None if r_clock == '0' else r_clock)
 
     # A method to process the time for historical events - got from event.get.
     def _process_history_event_time(self):
-        logger.debug('Start to process time for the event.')
-        if not self.event['r_eventid'] == '0':
-            # Prepare for the parameters to call event.get API.
-            r_event_params = {
-                'eventids': [self.event['r_eventid']],
-                'output': [
-                    'eventids',
-                    'clock'
-                ]
-            }
-            # Call event.get API to get the information of recovery event associated to the event.
-            inst_r_events = event.EventGet(self.api_url, self.api_token, r_event_params)
-            r_events = inst_r_events.api_query()
-            # Get the clock of recovery event, to put in 'r_clock' of the targeted event.
-            self.event['r_clock'] = r_events[0]['clock']
-            logger.debug('The r_clock for the event is %s' % self.event['r_clock'])
-            # Process the rest time attributes.
-            self.event['duration'] = base_lib.calculate_time_delta(self.event['clock'], self.event['r_clock'])
-            logger.debug('Calculated event duration in secs: %s' % self.event['duration'])
-            self.event['duration_readable'] = base_lib.convert_to_readable_time(
-                base_lib.calculate_time_delta(self.event['clock'], self.event['r_clock']))
-            logger.debug('Calculated event duration in readable format: %s' % self.event['duration_readable'])
-            self.event['time'] = datetime.datetime.fromtimestamp(int(self.event['clock']))
-            logger.debug('Calculated event time: %s' % self.event['time'])
-            self.event['recovery_time'] = datetime.datetime.fromtimestamp(int(self.event['r_clock']))
-            logger.debug('Calculated event recovery time: %s' % self.event['recovery_time'])
-        else:
-            self.event['duration'] = None
-            self.event['duration_readable'] = None
-            self.event['time'] = datetime.datetime.fromtimestamp(int(self.event['clock']))
-            logger.debug('Calculated event time: %s' % self.event['time'])
-            self.event['recovery_time'] = None
-        return self.event
+        # Get the clock of recovery event, if the event is resolved.
+        return self._process_clocks(self.event['clock'], self.events_recovery_clocks.get(self.event))
 
     # Process the time, recover_time, duration of events.
     def process(self):
@@ -176,23 +297,148 @@ class EventsTime:
             self._process_history_event_time()
         else:
             raise Exception('Zabbix API error. Neither r_clock nor r_eventid was define in API response.')
-        return self.event
+        # One line per event, and only when DEBUG is enabled.
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('Event %s: time %s, recovery time %s, duration %s secs (%s).',
+                         self.row.eventid, self.row.time, self.row.recovery_time,
+                         self.row.duration, self.row.duration_readable)
+        return self.row
 
 
 #####################################
-#       Class Event's Trigger       #
+#     Class Event's Time Columns    #
 #####################################
-# Define a class to describe the trigger information linked to the event by calling API trigger.get
-class EventsTrigger:
-    def __init__(self, triggerid, api_url, api_token):
-        self.triggerid = triggerid
+# Define a class to process the time, recover_time, duration of a chunk of events at once, column by column, instead
+# of event by event as EventsTime does.
+class EventsTimeColumns:
+    def __init__(self, events_recovery_clocks):
+        # The clocks of recovery events, resolved by EventsRecoveryClocks in advance.
+        self.events_recovery_clocks = events_recovery_clocks
+        # The lookup table of time attributes, eventid -> (time, recovery_time, duration, duration_readable).
+        self.times = {}
+
+    # Get the clock of the recovery event of the event, or None if it is not resolved.
+    def _get_r_clock(self, pre_process_event):
+        if 'r_clock' in pre_process_event:
+            # This is a recent event - problem.
+            return None if pre_process_event['r_clock'] == '0' else pre_process_event['r_clock']
+        if 'r_eventid' in pre_process_event:
+            # This is a history event - event.
+            return self.events_recovery_clocks.get(pre_process_event)
+        raise Exception('Zabbix API error. Neither r_clock nor r_eventid was define in API response.')
+
+    # Process the time attributes of all the events. The former chunk is dropped.
+    def build(self, pre_process_events):
+        clocks = [int(pre_process_event['clock']) for pre_process_event in pre_process_events]
+        r_clocks = [self._get_r_clock(pre_process_event) for pre_process_event in pre_process_events]
+        durations = base_lib.calculate_time_deltas(clocks, r_clocks)
+        durations_readable = base_lib.convert_to_readable_times(durations)
+        self.times = {
+            pre_process_event['eventid']: (base_lib.convert_to_datetime(clock),
+                                           None if r_clock is None else base_lib.convert_to_datetime(int(r_clock)),
+                                           duration, duration_readable)
+            for (pre_process_event, clock, r_clock, duration, duration_readable)
+            in zip(pre_process_events, clocks, r_clocks, durations, durations_readable)
+        }
+        return self.times
+
+    # Fill the time attributes of the row of the event, from the lookup table.
+    def fill(self, pre_process_event, event_row):
+        (event_row.time, event_row.recovery_time, event_row.duration, event_row.duration_readable) = \
+            self.times[pre_process_event['eventid']]
+        return event_row
+
+
+#####################################
+#   Class Event's Recovery Clocks   #
+#####################################
+# Define a class to resolve the clocks of recovery events for historical events, by calling API event.get in chunks.
+class EventsRecoveryClocks:
+    def __init__(self, api_url, api_token, workers):
         self.api_url = api_url
         self.api_token = api_token
+        # The number of threads sending the event.get queries concurrently.
+        self.workers = workers
+        # The lookup table of recovery events, r_eventid -> clock.
+        self.r_clocks = {}
+
+    # Collect the distinct r_eventids of the resolved events. Recent events from problem.get have 'r_clock' already.
+    @staticmethod
+    def _collect_r_eventids(pre_process_events):
+        # A dict keeps the r_eventids distinct and in the order of events.
+        r_eventids = {}
+        for pre_process_event in pre_process_events:
+            if 'r_clock' not in pre_process_event \
+                    and 'r_eventid' in pre_process_event \
+                    and not pre_process_event['r_eventid'] == '0':
+                r_eventids[pre_process_event['r_eventid']] = None
+        return list(r_eventids)
+
+    # Form the event.get query for a chunk of r_eventids.
+    def _build_chunk_query(self, r_eventids):
+        # Prepare for the parameters to call event.get API.
+        r_event_params = {
+            'eventids': r_eventids,
+            'output': [
+                'eventid',
+                'clock'
+            ]
+        }
+        return event.EventGet(self.api_url, self.api_token, r_event_params)
+
+    # Resolve the clocks of all the recovery events. The lookup table only keeps those of the latest events given,
+    # as a recovery event belongs to one event only.
+    def build(self, pre_process_events):
+        self.r_clocks = {}
+        r_eventids = self._collect_r_eventids(pre_process_events)
+        logger.info('%d recovery events to resolve, in chunks of %d.' % (len(r_eventids), RECOVERY_CHUNK_SIZE))
+        chunk_queries = [self._build_chunk_query(r_eventids[chunk_start:chunk_start + RECOVERY_CHUNK_SIZE])
+                         for chunk_start in range(0, len(r_eventids), RECOVERY_CHUNK_SIZE)]
+        # Call event.get API to get the information of recovery events associated to the events.
+        for r_events in base_lib.api_query_all(self.api_url, chunk_queries, self.workers):
+            for r_event in r_events:
+                self.r_clocks[r_event['eventid']] = r_event['clock']
+        # The recovery events may have been removed by the housekeeper.
+        for r_eventid in r_eventids:
+            if r_eventid not in self.r_clocks:
+                logger.warning('Recovery event %s was not returned by event.get.' % r_eventid)
+        return self.r_clocks
+
+    # Get the clock of the recovery event of the event. None if the event is not resolved or the clock is unknown.
+    def get(self, pre_process_event):
+        return self.r_clocks.get(pre_process_event['r_eventid'])
 
-    def get(self):
+
+#####################################
+#       Class Event's Triggers      #
+#####################################
+# Define a class to index the triggers linked to events by triggerid, by calling API trigger.get in chunks.
+class EventsTriggers:
+    def __init__(self, api_url, api_token, workers):
+        self.api_url = api_url
+        self.api_token = api_token
+        # The number of threads sending the trigger.get queries concurrently.
+        self.workers = workers
+        # The index of triggers, triggerid -> trigger.
+        self.triggers = {}
+
+    # Collect the distinct triggerids of the events which were created by triggers.
+    @staticmethod
+    def _collect_triggerids(pre_process_events):
+        # A dict keeps the triggerids distinct and in the order of events.
+        triggerids = {}
+        for pre_process_event in pre_process_events:
+            if pre_process_event['source'] == '0' \
+                    and pre_process_event['object'] == '0' \
+                    and not pre_process_event['objectid'] == '0':
+                triggerids[pre_process_event['objectid']] = None
+        return list(triggerids)
+
+    # Form the trigger.get query for a chunk of triggerids.
+    def _build_chunk_query(self, triggerids):
         # Prepare for the parameters to call trigger.get API.
         trigger_params = {
-            'triggerids': self.triggerid,
+            'triggerids': triggerids,
             'output': [
                 'triggerid',
                 'description',
@@ -209,10 +455,28 @@ class EventsTrigger:
             ],
             'selectTags': 'extend'
         }
-        # Call trigger.get API to get the information of triggers associated to the event.
-        inst_triggers = trigger.TriggerGet(self.api_url, self.api_token, trigger_params)
-        triggers = inst_triggers.api_query()
-        return triggers[0]
+        return trigger.TriggerGet(self.api_url, self.api_token, trigger_params)
+
+    # Get the triggers of all the events, which are not in the index yet.
+    def build(self, pre_process_events):
+        triggerids = [triggerid for triggerid in self._collect_triggerids(pre_process_events)
+                      if triggerid not in self.triggers]
+        logger.info('%d triggers to get, in chunks of %d.' % (len(triggerids), TRIGGER_CHUNK_SIZE))
+        chunk_queries = [self._build_chunk_query(triggerids[chunk_start:chunk_start + TRIGGER_CHUNK_SIZE])
+                         for chunk_start in range(0, len(triggerids), TRIGGER_CHUNK_SIZE)]
+        # Call trigger.get API to get the information of triggers associated to the events.
+        for triggers in base_lib.api_query_all(self.api_url, chunk_queries, self.workers):
+            for the_trigger in triggers:
+                self.triggers[the_trigger['triggerid']] = the_trigger
+        # The triggers may have been deleted, or not be visible to the user.
+        for triggerid in triggerids:
+            if triggerid not in self.triggers:
+                logger.warning('Trigger %s was not returned by trigger.get.' % triggerid)
+        return self.triggers
+
+    # Get the trigger linked to the event from the index. None if the event was not created by a known trigger.
+    def get(self, pre_process_event):
+        return self.triggers.get(pre_process_event['objectid'])
 
 
 #####################################
@@ -220,24 +484,24 @@ class EventsTrigger:
 #####################################
 # Define a class to get the severities of events.
 class EventsSeverity:
-    def __init__(self, api_version, pre_process_event, linked_trigger):
-        self.api_version = api_version
+    def __init__(self, pre_process_event, event_row, linked_trigger):
         self.event = pre_process_event
+        self.row = event_row
         self.trigger = linked_trigger
 
-    def get(self):
-        # For Zabbix v4 or v5, there is severity attribute for event. Just do mapping.
-        if re.search(r'^(5\.|4\.)', self.api_version, re.I) is not None:
-            logger.debug('This is Zabbix v4 or above, directly map the severity.')
-            self.event['severity'] = SEVERITY_MAPPING[self.event['severity']]
-            logger.debug('Mapped the severity of this event: %s' % self.event['severity'])
-            return self.event
-        # For Zabbix v3 or below, turn to call trigger.get to get severity information.
-        if self.event['source'] == '0' and self.event['object'] == '0' and not self.event['objectid'] == '0':
-            logger.debug('This is Zabbix v3 or below, call trigger.get to get the severity.')
-            self.event['severity'] = SEVERITY_MAPPING[self.trigger['priority']]
-            logger.debug('Mapped the severity of this event: %s' % self.event['severity'])
-            return self.event
+    # For Zabbix v4 or above, there is severity attribute for event. Just do mapping.
+    def get_from_event(self):
+        self.row.severity = SEVERITY_MAPPING[self.event['severity']]
+        logger.debug('Mapped the severity of this event: %s', self.row.severity)
+        return self.row
+
+    # For Zabbix v3 or below, get the severity from the trigger linked to the event.
+    def get_from_trigger(self):
+        if self.event['source'] == '0' and self.event['object'] == '0' and not self.event['objectid'] == '0' \
+                and self.trigger is not None:
+            self.row.severity = SEVERITY_MAPPING[self.trigger['priority']]
+            logger.debug('Mapped the severity of this event from the trigger: %s', self.row.severity)
+        return self.row
 
 
 #####################################
@@ -245,14 +509,18 @@ class EventsSeverity:
 #####################################
 # Define a class to get the name of events associated to triggers, applicable only for Zabbix v3 or below.
 class EventsName:
-    def __init__(self, pre_process_event, linked_trigger):
+    def __init__(self, pre_process_event, event_row, linked_trigger):
         self.event = pre_process_event
+        self.row = event_row
         self.trigger = linked_trigger
 
     def get(self):
-        self.event['name'] = self.trigger['description']
-        logger.debug('Mapped the name of this event: %s' % self.event['name'])
-        return self.event
+        if self.trigger is None:
+            logger.warning('No trigger found for event %s. The name is left as it is.', self.event['eventid'])
+            return self.row
+        self.row.name = self.trigger['description']
+        logger.debug('Mapped the name of this event: %s', self.row.name)
+        return self.row
 
 
 #####################################
@@ -260,8 +528,9 @@ class EventsName:
 #####################################
 # Define a class to get the information of triggers which created respective events.
 class EventsHostsAndGroups:
-    def __init__(self, pre_process_event, linked_trigger):
+    def __init__(self, pre_process_event, event_row, linked_trigger):
         self.event = pre_process_event
+        self.row = event_row
         self.trigger = linked_trigger
 
     # Pick up names for "triggers" object and put them to a string.
@@ -273,17 +542,18 @@ class EventsHostsAndGroups:
         # Form 'temp_hosts' list to a string.
         return ' ,'.join(temp_objs)
 
-    # Get the information of triggers which created respective events. And add more information to the events.
+    # Get the information of triggers which created respective events. And add more information to the row.
     def get(self):
         # Ensure that the event was created by a trigger.
         if self.event['source'] == '0'\
                 and self.event['object'] == '0'\
-                and not self.event['objectid'] == '0':
-            # Add hosts info to the event
-            self.event['hosts'] = self._process_names_list2string('hosts')
-            # Add groups info to the event
-            self.event['groups'] = self._process_names_list2string('groups')
-        return self.event
+                and not self.event['objectid'] == '0'\
+                and self.trigger is not None:
+            # Add hosts info to the row
+            self.row.hosts = self._process_names_list2string('hosts')
+            # Add groups info to the row
+            self.row.groups = self._process_names_list2string('groups')
+        return self.row
 
 
 #####################################
@@ -291,128 +561,246 @@ class EventsHostsAndGroups:
 #####################################
 # Define a class to describe 'type' of event, retrieve from the tag 'type', and put its value to the attribute 'type'.
 class EventsType:
-    def __init__(self, pre_process_event):
+    def __init__(self, pre_process_event, event_row):
         self.event = pre_process_event
+        self.row = event_row
 
     def get(self):
-        self.event['type'] = ''
+        self.row.type = ''
         for tag in self.event['tags']:
             for tag_attr in tag:
                 if tag[tag_attr] == 'type':
-                    self.event['type'] = tag['value']
+                    self.row.type = tag['value']
                     break
             else:
                 continue
             break
+        return self.row
+
+
+#####################################
+#      Class Events Processing      #
+#####################################
+# Define a class to process the version specific attributes of events, for Zabbix v4 or above.
+# The events have their own severity and name, and the acknowledgement of both historical and recent events.
+class EventsProcessingV4:
+    def process_severity(self, pre_process_event, event_row, linked_trigger):
+        EventsSeverity(pre_process_event, event_row, linked_trigger).get_from_event()
+
+    # The events have their own name already.
+    def process_name(self, pre_process_event, event_row, linked_trigger):
+        pass
+
+    def process_acknowledged(self, pre_process_event, event_row):
+        event_row.acknowledged = ACKNOWLEDGED_MAPPING[pre_process_event['acknowledged']]
+
+
+# Define a class to process the version specific attributes of events, for Zabbix v3 or below.
+# The severity and name come from the trigger, and recent events have no acknowledgement.
+class EventsProcessingV3(EventsProcessingV4):
+    def process_severity(self, pre_process_event, event_row, linked_trigger):
+        EventsSeverity(pre_process_event, event_row, linked_trigger).get_from_trigger()
+
+    def process_name(self, pre_process_event, event_row, linked_trigger):
+        EventsName(pre_process_event, event_row, linked_trigger).get()
+
+    def process_acknowledged(self, pre_process_event, event_row):
+        if 'acknowledged' in pre_process_event:
+            event_row.acknowledged = ACKNOWLEDGED_MAPPING[pre_process_event['acknowledged']]
+
+
+# Select the processing of events for the version of Zabbix API, once per export instead of per event.
+def select_events_processing(zbx_version):
+    if zbx_version >= (4, 0):
+        logger.info('Zabbix API version is %s. Processing events as Zabbix v4 or above.', zbx_version)
+        return EventsProcessingV4()
+    logger.info('Zabbix API version is %s. Processing events as Zabbix v3 or below.', zbx_version)
+    return EventsProcessingV3()
+
+
+#####################################
+#          Class Event Row          #
+#####################################
+# Define a class to hold an event to export, with one slot per column of HEADERS and no per-row dict.
+# The attributes not got for the event are left None, i.e. empty in the CSV file.
+class EventRow:
+    __slots__ = tuple(HEADERS)
+
+    def __init__(self, pre_process_event):
+        # The attributes kept as they are from the event. The severity and name are replaced for Zabbix v3 or below.
+        self.eventid = pre_process_event['eventid']
+        self.r_eventid = pre_process_event.get('r_eventid')
+        self.severity = pre_process_event.get('severity')
+        self.name = pre_process_event.get('name')
+        for attribute in HEADERS[4:]:
+            setattr(self, attribute, None)
+
+    # The values in the order of HEADERS, e.g. for csv.writer.
+    def as_tuple(self):
+        return tuple(getattr(self, attribute) for attribute in HEADERS)
+
+    def as_dict(self):
+        return {attribute: getattr(self, attribute) for attribute in HEADERS}
 
 
 #####################################
 #       Class Event To Export       #
 #####################################
-# Define a class to describe every event to be processed.
+# Define a class to describe every event to be processed. The event from Zabbix is left as it is, and the attributes
+# to export are put into an EventRow.
 class EventToExport:
-    def __init__(self, api_version, pre_process_event, api_url, api_token):
-        self.api_version = api_version
+    def __init__(self, events_processing, pre_process_event, events_triggers, events_recovery_clocks,
+                 events_time_columns=None):
+        # The processing of the version specific attributes, selected by select_events_processing in advance.
+        self.events_processing = events_processing
         self.event = pre_process_event
-        self.api_url = api_url
-        self.api_token = api_token
+        # The index of triggers linked to the events, built by EventsTriggers in advance.
+        self.events_triggers = events_triggers
+        # The clocks of recovery events, resolved by EventsRecoveryClocks in advance.
+        self.events_recovery_clocks = events_recovery_clocks
+        # The time attributes processed by EventsTimeColumns in advance, if any.
+        self.events_time_columns = events_time_columns
 
     def process(self):
-        # Process the time, recover_time, duration of events.
-        inst_events_time = EventsTime(self.event, self.api_url, self.api_token)
-        inst_events_time.process()
+        event_row = EventRow(self.event)
+
+        # Process the time, recover_time, duration of events, unless they are processed by columns.
+        if self.events_time_columns is not None:
+            self.events_time_columns.fill(self.event, event_row)
+        else:
+            inst_events_time = EventsTime(self.event, event_row, self.events_recovery_clocks)
+            inst_events_time.process()
 
-        # Get the information of triggers linked to events, by calling API trigger.get.
-        inst_triggers = EventsTrigger(self.event['objectid'], self.api_url, self.api_token)
-        the_trigger = inst_triggers.get()
+        # Get the information of the trigger linked to the event, from the index of triggers.
+        the_trigger = self.events_triggers.get(self.event)
 
         # Get the information of severity of the event.
-        inst_severity = EventsSeverity(self.api_version, self.event, the_trigger)
-        inst_severity.get()
+        self.events_processing.process_severity(self.event, event_row, the_trigger)
 
-        # Get the name of events, applicable ONLY for Zabbix v3 or below)
-        if re.search(r'^(5\.|4\.)', self.api_version, re.I) is not None:
-            logger.info('This is Zabbix v4 or above, no need to do anything.')
-        else:
-            logger.info('This is Zabbix v3 or below, call trigger.get to get the name of events.')
-            inst_name = EventsName(self.event, the_trigger)
-            inst_name.get()
+        # Get the name of events, from the trigger for Zabbix v3 or below.
+        self.events_processing.process_name(self.event, event_row, the_trigger)
 
         # Get the information of hosts and groups of the event.
-        inst_events_hosts_and_groups = EventsHostsAndGroups(self.event, the_trigger)
+        inst_events_hosts_and_groups = EventsHostsAndGroups(self.event, event_row, the_trigger)
         inst_events_hosts_and_groups.get()
 
-        # find the 'type' tag in the event, and clean up other tags.
-        inst_events_type = EventsType(self.event)
+        # find the 'type' tag in the event.
+        inst_events_type = EventsType(self.event, event_row)
         inst_events_type.get()
 
         # Acknowledged mapping
-        logger.info('Start to process acknowledgement.')
-        if re.search(r'^(5\.|4\.)', self.api_version, re.I) is not None:
-            self.event['acknowledged'] = ACKNOWLEDGED_MAPPING[self.event['acknowledged']]
-            logger.info('This is Zabbix v4 or above, Acknowledgement can be mapped')
-        else:
-            if 'acknowledged' in self.event:
-                self.event['acknowledged'] = ACKNOWLEDGED_MAPPING[self.event['acknowledged']]
-                logger.info('This is Zabbix v3 or below, historical event acknowledgement can be mapped.')
-            else:
-                self.event['acknowledged'] = None
-                logger.info('This is Zabbix v3 or below, recent event acknowledgement is unavailable.')
-
-        # Delete attributes not needed.
-        for attribute in list(self.event):
-            if attribute not in HEADERS:
-                del self.event[attribute]
-        return self.event
+        self.events_processing.process_acknowledged(self.event, event_row)
+        return event_row
 
 
 #####################################
-#             Main Body             #
+#         Funcs Export Jobs         #
 #####################################
-logger = base_lib.configure_logger()
-
-if __name__ == "__main__":
+# Convert a time in the format like 2020-05-03 18:59:36, or Now, to a Unix timestamp.
+def convert_to_timestamp(time_to_convert):
+    if time_to_convert == 'Now':
+        return time.time()
+    if base_lib.verify_time(time_to_convert) is False:
+        logger.error('The time %s is invalid.', time_to_convert)
+        raise Exception('Invalid time %s. Example of format: 2020-05-03 18:59:36, or Now.' % time_to_convert)
+    return time.mktime(time.strptime(time_to_convert, '%Y-%m-%d %H:%M:%S'))
+
+
+# Form an export job, i.e. a dict of the output filename, the event query type, the timeframe and the options.
+# An incremental job with a checkpoint continues from it, instead of its timeframe.
+def build_export_job(csv_filename, history_or_recent, time_from, time_till, options):
+    export_job = {
+        'output': csv_filename,
+        'type': history_or_recent,
+        'time_from': time_from,
+        'time_till': time_till,
+        'checkpoint': None,
+        'workers': options.workers,
+        'shard_size': options.shard_size,
+        'shard_events': options.shard_events,
+        'incremental': options.incremental,
+        'stream': options.stream,
+        'columnar_time': options.columnar_time
+    }
+    if export_job['incremental']:
+        if not output_writer.get_writer_class(csv_filename).supports_append:
+            raise Exception('Incremental export cannot append to the file %s. Choose another format.' % csv_filename)
+        export_job['checkpoint'] = ExportCheckpoint(csv_filename)
+        export_job['checkpoint'].load()
+    return export_job
+
+
+# Get an export job from user inputs - interactive.
+def input_export_job(options):
     # Get output CSV filename - interactive.
     inst_csv_filename = base_lib.CsvFilename()
     csv_filename = inst_csv_filename.user_input()
+    export_job = build_export_job(csv_filename, None, None, None, options)
 
     # Get if historical or recent events and timeframe  - interactive.
-    history_or_recent = input_event_query_type()
-    if history_or_recent == 'History':
-        (time_from, time_till) = input_event_timeframe()
+    if export_job['incremental']:
+        logger.info('Incremental export is for historical events.')
+        export_job['type'] = 'History'
     else:
-        time_from = time_till = None
-
-    # Get URL - may be interactive.
-    inst_url = base_lib.ZabbixURL()
-    url = inst_url.get_url()
-
-    # Get the token after login - may be interactive.
-    inst_login = user.UserLogin(url)
-    token = inst_login.api_query()
-
-    # Running timer starts ticking.
-    program_start_time = timeit.default_timer()
-
-    # Get Zabbix API verizon
-    inst_zbx_api_version = apiinfo.ApiinfoVersion(url)
-    zbx_api_version = str(inst_zbx_api_version.api_query())
-
+        export_job['type'] = input_event_query_type()
+    if export_job['type'] == 'History' and not (export_job['checkpoint'] and export_job['checkpoint'].eventid):
+        (export_job['time_from'], export_job['time_till']) = input_event_timeframe()
+    return export_job
+
+
+# Load the export jobs from a YAML job file. Each job has 'output', 'type' (History or Recent), and for History,
+# 'time_from' and 'time_till'. It may override the options shard_size, shard_events, incremental, stream and
+# columnar_time.
+def load_export_jobs(jobs_filename, options):
+    with open(jobs_filename, mode='r') as jobs_file:
+        jobs_conf = yaml.load(jobs_file.read(), Loader=yaml.SafeLoader) or {}
+    export_jobs = []
+    for job_conf in jobs_conf.get('jobs') or []:
+        # Verify the job, so that a bad job stops the run before anything is exported.
+        if not job_conf.get('output') or base_lib.CsvFilename._verify_filename_suffix(job_conf['output']) is False:
+            raise Exception('Invalid output filename in job %s.' % job_conf)
+        history_or_recent = job_conf.get('type', 'History')
+        if history_or_recent not in ('History', 'Recent'):
+            raise Exception('Invalid type %s in job %s. It should be History or Recent.' % (history_or_recent,
+                                                                                          job_conf))
+        job_options = argparse.Namespace(**dict(vars(options), **{
+            option: job_conf[option]
+            for option in ('shard_size', 'shard_events', 'incremental', 'stream', 'columnar_time')
+            if option in job_conf}))
+        for option in ('shard_size', 'shard_events'):
+            if getattr(job_options, option) is not None and not (isinstance(getattr(job_options, option), int)
+                                                                 and getattr(job_options, option) >= 1):
+                raise Exception('Invalid %s in job %s. It should be 1 or more.' % (option, job_conf))
+        export_job = build_export_job(job_conf['output'], history_or_recent, None, None, job_options)
+        if export_job['incremental'] and history_or_recent != 'History':
+            raise Exception('Incremental export is for historical events. Job: %s.' % job_conf)
+        if history_or_recent == 'History' and not (export_job['checkpoint'] and export_job['checkpoint'].eventid):
+            export_job['time_from'] = convert_to_timestamp(str(job_conf.get('time_from')))
+            export_job['time_till'] = convert_to_timestamp(str(job_conf.get('time_till', 'Now')))
+        export_jobs.append(export_job)
+    logger.info('Loaded %d export jobs from %s.', len(export_jobs), jobs_filename)
+    return export_jobs
+
+
+# Run an export job: get the events, enrich them and write them to the CSV file.
+def run_export_job(url, token, zbx_version, export_job):
+    logger.info('Running the export job of %s events to %s.', export_job['type'], export_job['output'])
+    inst_checkpoint = export_job['checkpoint']
     # For historical event - event.get query:
-    if history_or_recent == 'History':
-        # Initiate the event.get query, get event from Zabbix
-        event_params = {
-            'output': 'extend',
-            'time_from': time_from,
-            'time_till': time_till,
-            'value': [1, 2, 3],
-            'selectAcknowledges': 'extend',
-            'selectTags': 'extend',
-            'sortfield': ['clock'],
-            'sortorder': 'ASC'
-        }
-        inst_events = event.EventGet(url, token, event_params)
-        zbx_events = inst_events.api_query()
+    if export_job['type'] == 'History':
+        (time_from, time_till, eventid_from) = (export_job['time_from'], export_job['time_till'], None)
+        if inst_checkpoint is not None and inst_checkpoint.eventid is not None:
+            # Get the events newer than the checkpoint by eventid, whatever their clock, till now.
+            (time_from, time_till) = (None, time.time())
+            eventid_from = inst_checkpoint.eventid + 1
+            logger.info('Exporting the events from eventid %d on.', eventid_from)
+        # Initiate the event.get queries, get event from Zabbix shard by shard.
+        inst_events = EventsHistory(url, token, time_from, time_till, eventid_from, export_job['shard_size'],
+                                    export_job['shard_events'], export_job['workers'], export_job['stream'],
+                                    export_job['incremental'])
+        start_time = timeit.default_timer()
+        zbx_events = inst_events.get()
+        base_lib.get_metrics().add_stage_time('fetch_events', timeit.default_timer() - start_time)
     # For recent event query - problem.get query:
     else:
         # Initiate the problem.get query, get event from Zabbix
@@ -425,26 +813,210 @@ if __name__ == "__main__":
             'sortorder': 'ASC'
         }
         inst_problems = problem.ProblemGet(url, token, problem_params)
-        zbx_events = inst_problems.api_query()
+        if export_job['stream']:
+            zbx_events = inst_problems.api_query_iter()
+        else:
+            start_time = timeit.default_timer()
+            zbx_events = inst_problems.api_query()
+            base_lib.get_metrics().add_stage_time('fetch_events', timeit.default_timer() - start_time)
+
+    # Enrich the events and write them to the CSV file one by one, as soon as they are ready.
+    inst_events_triggers = EventsTriggers(url, token, export_job['workers'])
+    inst_events_recovery_clocks = EventsRecoveryClocks(url, token, export_job['workers'])
+    inst_events_time_columns = None
+    if export_job['columnar_time']:
+        inst_events_time_columns = EventsTimeColumns(inst_events_recovery_clocks)
+    return write_events(export_job['output'],
+                        enrich_events(select_events_processing(zbx_version), zbx_events, inst_events_triggers,
+                                      inst_events_recovery_clocks, inst_events_time_columns),
+                        inst_checkpoint)
+
+
+#####################################
+#      Class Export Checkpoint      #
+#####################################
+# Define a class to record the progress of an export in a checkpoint file next to the CSV file: the greatest eventid
+# and the latest clock written, and the size of the CSV file when they were committed. The rows of an incremental
+# export are written in the order of eventid, so every event up to the eventid has been written.
+class ExportCheckpoint:
+    def __init__(self, csv_filename):
+        self.path = csv_filename + '.checkpoint'
+        self.eventid = None
+        self.clock = None
+        self.csv_offset = None
+
+    # Load the checkpoint file. Return False if there is none yet.
+    def load(self):
+        if not os.path.exists(self.path):
+            logger.info('No checkpoint file %s yet.', self.path)
+            return False
+        with open(self.path, mode='r') as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        self.eventid = checkpoint['eventid']
+        self.clock = checkpoint['clock']
+        self.csv_offset = checkpoint['csv_offset']
+        logger.info('Loaded the checkpoint: eventid %s, clock %s, CSV offset %s.',
+                    self.eventid, self.clock, self.csv_offset)
+        return True
+
+    # Save the checkpoint file atomically, so that a crash leaves either the previous or the new checkpoint.
+    def save(self, eventid, clock, csv_offset):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, mode='w') as checkpoint_file:
+            json.dump({'eventid': eventid, 'clock': clock, 'csv_offset': csv_offset}, checkpoint_file)
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+        os.replace(temp_path, self.path)
+        (self.eventid, self.clock, self.csv_offset) = (eventid, clock, csv_offset)
+
 
-    # Processing the list 'events'.
+#####################################
+#       Funcs Export Pipeline       #
+#####################################
+# Split the events into lists of at most chunk_size events, as a generator.
+def iter_chunks(zbx_events, chunk_size):
+    chunk = []
     for zbx_event in zbx_events:
-        inst_event_to_export = EventToExport(zbx_api_version, zbx_event, url, token)
-        inst_event_to_export.process()
-
-    # Finished the work with Zabbix API. Logout.
-    logout = user.UserLogout(url, token)
-    logout.api_query()
-
-    # Create CSV, and put in the data.
-    logger.info('Creating a CSV file %s' % csv_filename)
-    with open(csv_filename, 'w', newline='') as f:
-        f_csv = csv.DictWriter(f, HEADERS)
-        f_csv.writeheader()
-        logger.debug('Wrote the headers.')
-        f_csv.writerows(zbx_events)
-        logger.debug('Wrote the content.')
+        chunk.append(zbx_event)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# Enrich the events chunk by chunk, and yield every event as soon as it is ready to export.
+def enrich_events(events_processing, zbx_events, events_triggers, events_recovery_clocks, events_time_columns=None):
+    metrics = base_lib.get_metrics()
+    chunks = iter_chunks(zbx_events, EXPORT_CHUNK_SIZE)
+    while True:
+        # The time to get a chunk of events, i.e. to receive them if they are streamed.
+        start_time = timeit.default_timer()
+        chunk = next(chunks, None)
+        metrics.add_stage_time('fetch_events', timeit.default_timer() - start_time)
+        if chunk is None:
+            break
+        # Get the triggers linked to the events in chunks, instead of one trigger.get per event.
+        start_time = timeit.default_timer()
+        events_triggers.build(chunk)
+        metrics.add_stage_time('lookup_triggers', timeit.default_timer() - start_time)
+        # Resolve the clocks of recovery events in chunks, instead of one event.get per resolved event.
+        start_time = timeit.default_timer()
+        events_recovery_clocks.build(chunk)
+        metrics.add_stage_time('lookup_recovery_clocks', timeit.default_timer() - start_time)
+        # Process the time attributes of the chunk column by column, if opted.
+        if events_time_columns is not None:
+            start_time = timeit.default_timer()
+            events_time_columns.build(chunk)
+            metrics.add_stage_time('process_time_columns', timeit.default_timer() - start_time)
+        process_time = 0.0
+        for zbx_event in chunk:
+            start_time = timeit.default_timer()
+            inst_event_to_export = EventToExport(events_processing, zbx_event, events_triggers,
+                                                 events_recovery_clocks, events_time_columns)
+            event_row = inst_event_to_export.process()
+            process_time += timeit.default_timer() - start_time
+            yield event_row
+        metrics.add_stage_time('process_events', process_time)
+
+
+# Commit the rows written so far: flush them to disk, then record them in the checkpoint.
+# A compressed or columnar file is committed only when it is closed, so its rows are just flushed.
+def commit_events(writer, checkpoint, eventid, clock):
+    if checkpoint is not None and eventid is not None:
+        offset = writer.commit()
+        if offset is not None:
+            checkpoint.save(eventid, clock, offset)
+    else:
+        writer.flush()
+
+
+# Write the events to the output file as they come, and flush the file every FLUSH_INTERVAL rows. The format of the
+# file, e.g. CSV, gzip-compressed CSV, JSON Lines or Parquet, follows the suffix of its filename.
+# With a checkpoint, rows are appended after the last committed ones, and each flush is committed to the checkpoint.
+def write_events(output_filename, enriched_events, checkpoint=None):
+    rows = 0
+    writer_class = output_writer.get_writer_class(output_filename)
+    if checkpoint is not None and checkpoint.csv_offset is not None:
+        # Drop the rows written after the last commit by a crashed run, and append the new rows.
+        logger.info('Appending to the file %s from offset %d.', output_filename, checkpoint.csv_offset)
+        writer = writer_class(output_filename, HEADERS, COLUMN_TYPES, checkpoint.csv_offset)
+        (eventid, clock) = (checkpoint.eventid, checkpoint.clock)
+    else:
+        logger.info('Creating a file %s with %s.', output_filename, writer_class.__name__)
+        writer = writer_class(output_filename, HEADERS, COLUMN_TYPES)
+        (eventid, clock) = (None, None)
+    write_time = 0.0
+    try:
+        for event_row in enriched_events:
+            start_time = timeit.default_timer()
+            writer.write_row(event_row.as_tuple())
+            rows += 1
+            # Keep the greatest eventid and the latest clock, to get the newer events next time.
+            eventid = max(int(event_row.eventid), eventid or 0)
+            clock = max(int(event_row.time.timestamp()), clock or 0)
+            if rows % FLUSH_INTERVAL == 0:
+                commit_events(writer, checkpoint, eventid, clock)
+                logger.info('Wrote %d rows.', rows)
+            write_time += timeit.default_timer() - start_time
+    finally:
+        start_time = timeit.default_timer()
+        offset = writer.close(sync=checkpoint is not None)
+        write_time += timeit.default_timer() - start_time
+        base_lib.get_metrics().add_stage_time('write_rows', write_time)
+        base_lib.get_metrics().add_counter('exported_events', rows)
+    if checkpoint is not None and eventid is not None:
+        checkpoint.save(eventid, clock, offset)
+    logger.debug('Wrote the content.')
+    logger.info('Wrote %d rows in total to %s.' % (rows, output_filename))
+    return rows
+
+
+#####################################
+#             Main Body             #
+#####################################
+logger = base_lib.configure_logger('event_export_csv')
+
+if __name__ == "__main__":
+    # Get the command line options.
+    args = parse_arguments()
+
+    # Get the export jobs, either from the job file or interactively.
+    if args.jobs is not None:
+        export_jobs = load_export_jobs(args.jobs, args)
+    else:
+        export_jobs = [input_export_job(args)]
+
+    # A streamed response holds its connection, while the lookups of its events need another one.
+    if any(export_job['stream'] for export_job in export_jobs) and base_lib.get_connection_pool().max_connections < 2:
+        logger.critical('--stream needs max_connections of 2 or more in the connection pool.')
+        raise Exception('--stream needs max_connections of 2 or more in the connection pool.')
+
+    # Get URL - may be interactive.
+    inst_url = base_lib.ZabbixURL()
+    url = inst_url.get_url()
+
+    # Get Zabbix API version, once per URL. The login depends on it.
+    zbx_version = apiinfo.get_zabbix_version(url)
+
+    # Get the token, by login or from the token cache or config file - login may be interactive.
+    inst_session = user.ZabbixSession(url)
+    token = inst_session.open()
+
+    # Running timer starts ticking, and so does the run deadline, if any.
+    program_start_time = timeit.default_timer()
+    base_lib.start_run_deadline()
+
+    # Run the jobs one after another, sharing the session, the API version and the connection pool.
+    for export_job in export_jobs:
+        run_export_job(url, token, zbx_version, export_job)
+
+    # Finished the work with Zabbix API. Logout, unless the session is kept for reuse.
+    inst_session.close()
 
     # Running timer stops ticking.
     program_end_time = timeit.default_timer()
     logger.info('Program running time is %s' % (program_end_time - program_start_time))
+
+    # Report the API calls and the stages of the run.
+    base_lib.report_metrics()
@@ -7,11 +7,13 @@
 """
 Table of Content:
     Section 1 - apiinfo.version
+    Section 2 - Zabbix Version
     Logging Configuration
 """
 
 import random
-import json
+import threading
+import functools
 
 from modules import base_lib
 
@@ -24,10 +26,12 @@ class ApiinfoVersion(base_lib.MetaClassForQuery):
     def __init__(self, url):
         # url, the URL of Zabbix API
         self.url = url
+        # apiinfo.version must be called without a token.
+        self.token = None
         # method to call Zabbix APIs.
         self.method = 'apiinfo.version'
 
-    def _generate_payload(self):
+    def _generate_python_payload(self):
         # Create the base payload.
         python_payload = {
             'jsonrpc': '2.0',
@@ -35,15 +39,76 @@ class ApiinfoVersion(base_lib.MetaClassForQuery):
             'params': [],
             'id': random.randint(0, 1000),
         }
-        # Transfer from a python object to a JSON object.
-        json_payload = json.dumps(python_payload)
-        logger.info('JSON payload generated, content: %s' % json_payload)
-        return json_payload
+        return python_payload
 
     # Other methods are inherited from the Parent class 'MetaClassForQuery'.
 
 
+#####################################
+#    Section 2 - Zabbix Version     #
+#####################################
+# Define a class ZabbixVersion to hold a version of Zabbix API, parsed from a string like 5.0.3 or 7.0.0rc1.
+# The versions compare as tuples of (major, minor, patch), e.g. version >= (5, 4).
+@functools.total_ordering
+class ZabbixVersion:
+    def __init__(self, version_string):
+        self.version_string = str(version_string)
+        numbers = []
+        for part in self.version_string.split('.')[:3]:
+            # Keep the leading digits only, e.g. 0rc1 -> 0.
+            digits = ''
+            for char in part:
+                if not char.isdigit():
+                    break
+                digits += char
+            numbers.append(int(digits or 0))
+        if not numbers or not self.version_string[:1].isdigit():
+            logger.critical('Zabbix API version %s cannot be parsed.', self.version_string)
+            raise Exception('Zabbix API version %s cannot be parsed.' % self.version_string)
+        (self.major, self.minor, self.patch) = (numbers + [0, 0])[:3]
+
+    def as_tuple(self):
+        return self.major, self.minor, self.patch
+
+    # Pad a version, or a tuple like (5, 4), to (major, minor, patch) to compare with.
+    @staticmethod
+    def _pad(other):
+        other = tuple(other)
+        return other + (0,) * (3 - len(other))
+
+    def __eq__(self, other):
+        return self.as_tuple() == self._pad(other)
+
+    def __lt__(self, other):
+        return self.as_tuple() < self._pad(other)
+
+    def __iter__(self):
+        return iter(self.as_tuple())
+
+    def __hash__(self):
+        return hash(self.as_tuple())
+
+    def __str__(self):
+        return self.version_string
+
+    def __repr__(self):
+        return 'ZabbixVersion(%r)' % self.version_string
+
+
+_zabbix_versions = {}
+_zabbix_versions_lock = threading.Lock()
+
+
+# Get the version of Zabbix API at the URL. It is got once per URL and process, by apiinfo.version.
+def get_zabbix_version(url):
+    with _zabbix_versions_lock:
+        if url not in _zabbix_versions:
+            _zabbix_versions[url] = ZabbixVersion(ApiinfoVersion(url).api_query())
+            logger.info('Zabbix API version of %s is %s.', url, _zabbix_versions[url])
+        return _zabbix_versions[url]
+
+
 #####################################
 #       Logging Configuration       #
 #####################################
-logger = base_lib.configure_logger()
+logger = base_lib.configure_logger('apiinfo')
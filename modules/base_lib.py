@@ -10,8 +10,13 @@ Table of Content:
     Section 2 - Logger Configurator
     Section 3 - Zabbix URL
     Section 4 - Zabbix Credential
-    Section 5 - Connection with Zabbix
-    Section 6 - Meta Class of Query
+    Section 5 - HTTP Connection Pool
+    Section 6 - Connection with Zabbix
+    Section 7 - Asyncio Connection
+    Section 8 - Meta Class of Query
+    Section 9 - Batch Query
+    Section 10 - Metrics
+    Section 11 - JSON Codec
     Logging Configuration
 """
 
@@ -22,20 +27,125 @@ import ssl
 import random
 import os
 import time
+import threading
+import atexit
+import asyncio
+import weakref
+import concurrent.futures
 import datetime
-import re
+import codecs
+import functools
+import gzip
+import zlib
 
 import yaml
 
+# brotli is optional. Responses compressed with br are asked for only if it is installed, in a version able to bound
+# the output of each decompression, i.e. 1.2 and above.
+try:
+    import brotli
+    if not hasattr(brotli.Decompressor(), 'can_accept_more_data'):
+        brotli = None
+except ImportError:
+    brotli = None
+
+# orjson, simdjson and ujson are optional. The JSON codec falls back to the json of the standard library without them.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
 
 #####################################
 #  Section 1 - Miscellaneous Funcs  #
 #####################################
-# Open YAML configuration file and parse it to a Python dict.
+# The config file used unless the environment variable ZABBIX_API_CONFIG points at another one.
+DEFAULT_CONFIG_PATH = './zabbix-api-config.yml'
+
+
+# Define a class ZabbixConfig to parse the YAML configuration file once, and re-parse it only if it is modified.
+class ZabbixConfig:
+    def __init__(self, path):
+        # path, the path of the YAML configuration file.
+        self.path = path
+        self._parsed_result = None
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    # Open YAML configuration file and parse it to a Python dict.
+    def _load(self, mtime):
+        with open(self.path, mode='r') as conf_file:
+            self._parsed_result = yaml.load(conf_file.read(), Loader=yaml.SafeLoader) or {}
+        self._mtime = mtime
+
+    # Get the whole config as a Python dict. The file is parsed again only if its mtime has changed.
+    def get_all(self):
+        mtime = os.stat(self.path).st_mtime_ns
+        with self._lock:
+            if self._parsed_result is None or mtime != self._mtime:
+                self._load(mtime)
+            return self._parsed_result
+
+    # Parse the file again, whether it is modified or not.
+    def reload(self):
+        with self._lock:
+            self._load(os.stat(self.path).st_mtime_ns)
+
+    # Get a section of the config as a dict. A missing or empty section is an empty dict.
+    def get_section(self, section):
+        return self.get_all().get(section) or {}
+
+    # Get a value of a section, or the default if it is missing or empty.
+    def get_value(self, section, key, default=None):
+        value = self.get_section(section).get(key)
+        return default if value is None or value == '' else value
+
+    def get_int(self, section, key, default):
+        return int(self.get_value(section, key, default))
+
+    def get_float(self, section, key, default):
+        return float(self.get_value(section, key, default))
+
+    def get_bool(self, section, key, default):
+        return bool(self.get_value(section, key, default))
+
+    # The URL of Zabbix API, or None.
+    def get_api_url(self):
+        return self.get_all().get('api_url')
+
+    # The username and password of Zabbix API, each of them may be None.
+    def get_user_credential(self):
+        return self.get_value('user', 'username'), self.get_value('user', 'password')
+
+
+_config = ZabbixConfig(os.environ.get('ZABBIX_API_CONFIG', DEFAULT_CONFIG_PATH))
+
+
+# Get the process-wide config.
+def get_config():
+    return _config
+
+
+# Point the process-wide config at another file. Set ZABBIX_API_CONFIG instead, to cover the loggers of modules.
+def set_config_path(path):
+    global _config
+    _config = ZabbixConfig(path)
+    return _config
+
+
+# Get the whole config as a Python dict.
 def get_yaml():
-    with open('./zabbix-api-config.yml', mode='r') as conf_file:
-        parsed_result = yaml.load(conf_file.read(), Loader=yaml.SafeLoader)
-    return parsed_result
+    return get_config().get_all()
 
 
 # Verify if user input time is valid.
@@ -56,14 +166,10 @@ def compare_time(t1, t2):
         return False
 
 
-# Calculate time difference
+# Calculate time difference, in secs. It is the difference of the Unix timestamps, whatever number of days it spans.
 def calculate_time_delta(t1, t2):
-    start_time = datetime.datetime.fromtimestamp(int(t1))
-    logger.debug('t1 = %s' % start_time)
-    end_time = datetime.datetime.fromtimestamp(int(t2))
-    logger.debug('t2 = %s' % end_time)
-    time_delta = (end_time - start_time).seconds
-    logger.info('time delta = %s' % time_delta)
+    time_delta = int(t2) - int(t1)
+    logger.debug('t1 = %s, t2 = %s, time delta = %s', t1, t2, time_delta)
     return time_delta
 
 
@@ -75,7 +181,7 @@ def convert_to_readable_time(secs):
         if hrs > 0:
             days, hr = divmod(hrs, 24)
             if days > 0:
-                time_readable = str(days) + 'd ' + str(hrs) + 'h ' + str(mins) + 'm ' + str(sec) + 's'
+                time_readable = str(days) + 'd ' + str(hr) + 'h ' + str(mins) + 'm ' + str(sec) + 's'
             else:
                 time_readable = str(hrs) + 'h ' + str(mins) + 'm ' + str(sec) + 's'
         else:
@@ -85,61 +191,287 @@ def convert_to_readable_time(secs):
     return time_readable
 
 
+# Convert a Unix timestamp to a local datetime. Events often share their clocks, so the conversions are cached.
+@functools.lru_cache(maxsize=65536)
+def convert_to_datetime(timestamp):
+    return datetime.datetime.fromtimestamp(int(timestamp))
+
+
+# The columnar counterpart of calculate_time_delta, for whole columns of Unix timestamps at once.
+# A None in t2s, e.g. an event not resolved, gives a None.
+def calculate_time_deltas(t1s, t2s):
+    return [None if t2 is None else int(t2) - int(t1) for (t1, t2) in zip(t1s, t2s)]
+
+
+# The columnar counterpart of convert_to_readable_time, for a whole column of secs at once. A None gives a None.
+def convert_to_readable_times(secs_column):
+    return [None if secs is None else convert_to_readable_time(secs) for secs in secs_column]
+
+
+# The suffixes of output filenames, one per format. Refer to output_writer.WRITERS for their writers.
+OUTPUT_FILENAME_SUFFIXES = ('.csv', '.csv.gz', '.csv.zst', '.jsonl', '.jsonl.gz', '.parquet')
+
+
 class CsvFilename:
     @staticmethod
     def _verify_filename_suffix(input_filename):
-        # Verify if the filename ends up with '.csv'.
-        if re.search(r'/*\.csv', input_filename, re.I) is None:
+        # Verify if the filename ends up with one of the output filename suffixes, e.g. '.csv'.
+        if not input_filename.lower().endswith(OUTPUT_FILENAME_SUFFIXES):
             logger.error('Filename suffix verification failed. Content verified: %s' % input_filename)
             return False
         else:
             logger.info('Filename suffix verification succeeded. Content verification %s' % input_filename)
             return True
 
-    @staticmethod
-    def _process_windows_path(input_filename):
-        if '\\' in input_filename:
-            logger.info('Found character \\ in user input filename %s . To be dealt with.' % input_filename)
-            input_filename = 'r\'' + input_filename + '\''
-            return input_filename
-        else:
-            return input_filename
-
     def user_input(self):
         input_filename = input('Output filename:\n'
-                               'e.g. csv1.csv, C:\\Download\\csv1.csv, /tmp/csv1.csv, ../csv1,csv\n'
+                               'e.g. csv1.csv, C:\\Download\\csv1.csv.gz, /tmp/csv1.parquet, ../csv1,csv\n'
                                'If you do not specify the path, it will be put in the current fold.\n')
         # Verify suffix filename.
         while self._verify_filename_suffix(input_filename) is False:
-            input_filename = input('Invalid filename suffix. The suffix should end with .csv!\n'
+            input_filename = input('Invalid filename suffix. The suffix should be one of %s!\n'
                                    'Output filename:\n'
-                                   'e.g. csv1.csv, C:\\Download\\csv1.csv, /tmp/csv1.csv, ../csv1,csv\n'
-                                   'If you do not specify the path, it will be put in the current fold.\n')
-        # Handle Windows path.
-        input_filename = self._process_windows_path(input_filename)
+                                   'e.g. csv1.csv, C:\\Download\\csv1.csv.gz, /tmp/csv1.parquet, ../csv1,csv\n'
+                                   'If you do not specify the path, it will be put in the current fold.\n'
+                                   % ', '.join(OUTPUT_FILENAME_SUFFIXES))
+        # A Windows path, e.g. C:\Download\csv1.csv, is used as is. Backslashes typed at the prompt are not escapes.
         return input_filename
 
 
+# Define a class StreamingResultParser to parse the 'result' array of a JSON-RPC response element by element,
+# reading the stream bit by bit. Only one element and one read are held in memory at a time.
+class StreamingResultParser:
+    def __init__(self, stream, read_size=65536):
+        # stream, a file-like object with read(), e.g. http.client.HTTPResponse.
+        self.stream = stream
+        self.read_size = read_size
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        # The number of bytes read from the stream so far.
+        self.bytes_read = 0
+        self._decoder = json.JSONDecoder()
+        self._utf8_decoder = codecs.getincrementaldecoder('utf-8')()
+
+    # Read more data to the buffer, dropping the part already parsed. Return False at the end of the stream.
+    def _fill(self):
+        if self.eof:
+            return False
+        data = self.stream.read(self.read_size)
+        self.bytes_read += len(data)
+        self.eof = not data
+        self.buffer = self.buffer[self.pos:] + self._utf8_decoder.decode(data, final=self.eof)
+        self.pos = 0
+        return not self.eof
+
+    # Skip whitespaces and return the next character, without consuming it.
+    def _peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in ' \t\r\n':
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise ValueError('Unexpected end of the JSON response.')
+
+    # Consume the next character, which must be one of the expected.
+    def _expect(self, expected):
+        character = self._peek()
+        if character not in expected:
+            raise ValueError('Invalid JSON response. Expected one of %s, got %s.' % (expected, character))
+        self.pos += 1
+        return character
+
+    # Decode the next JSON value. A value touching the end of the buffer may be truncated, e.g. a number. So may a
+    # number followed by the start of a fraction or exponent only, e.g. -9 of -9.5e3 cut as -9. or -9.5e.
+    def _decode_value(self):
+        self._peek()
+        while True:
+            try:
+                (value, end) = self._decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            if end == len(self.buffer) and self._fill():
+                continue
+            if isinstance(value, (int, float)) and not isinstance(value, bool) \
+                    and not self.buffer[end:].strip('0123456789+-.eE') and self._fill():
+                continue
+            self.pos = end
+            return value
+
+    # Yield the elements of 'result' one by one. A 'result' which is not an array is yielded as a whole.
+    # A response without 'result' is verified as a whole, which raises the error from Zabbix.
+    def iter_result(self):
+        other_members = {}
+        found_result = False
+        self._expect('{')
+        if self._peek() == '}':
+            self.pos += 1
+        else:
+            while True:
+                member_name = self._decode_value()
+                self._expect(':')
+                if member_name == 'result' and self._peek() == '[':
+                    found_result = True
+                    self.pos += 1
+                    if self._peek() == ']':
+                        self.pos += 1
+                    else:
+                        while True:
+                            yield self._decode_value()
+                            if self._expect(',]') == ']':
+                                break
+                elif member_name == 'result':
+                    found_result = True
+                    yield self._decode_value()
+                else:
+                    other_members[member_name] = self._decode_value()
+                if self._expect(',}') == '}':
+                    break
+        if not found_result:
+            MetaClassForQuery._verify_result_basic(other_members)
+
+
+# Define a class BrotliDecompressor to give the decompressor of brotli the interface of zlib.decompressobj.
+# brotli keeps the input beyond max_length inside, and then takes no more input until its output is drained. The
+# input given meanwhile is kept in unconsumed_tail, to be given again, as zlib does.
+class BrotliDecompressor:
+    def __init__(self):
+        self._decompressor = brotli.Decompressor()
+        self.unconsumed_tail = b''
+
+    def decompress(self, data, max_length=0):
+        if max_length <= 0:
+            self.unconsumed_tail = b''
+            output = self._decompressor.process(data)
+            while not self._decompressor.can_accept_more_data():
+                output += self._decompressor.process(b'')
+            return output
+        if self._decompressor.can_accept_more_data():
+            self.unconsumed_tail = b''
+            return self._decompressor.process(data, output_buffer_limit=max_length)
+        self.unconsumed_tail = data
+        return self._decompressor.process(b'', output_buffer_limit=max_length)
+
+    def flush(self):
+        return b''
+
+
+# Get a decompressor of the HTTP content coding, i.e. the Content-Encoding of a response, or None if it is not coded.
+def get_decompressor(content_encoding):
+    content_encoding = (content_encoding or 'identity').strip().lower()
+    if content_encoding == 'identity':
+        return None
+    # zlib detects the gzip or zlib header by itself, with wbits 32 + MAX_WBITS.
+    if content_encoding in ('gzip', 'x-gzip', 'deflate'):
+        return zlib.decompressobj(32 + zlib.MAX_WBITS)
+    if content_encoding == 'br' and brotli is not None:
+        return BrotliDecompressor()
+    raise Exception('The content coding %s of the response is not supported.' % content_encoding)
+
+
+# Decode a whole response body of the HTTP content coding.
+def decode_response_body(response_body, content_encoding):
+    decompressor = get_decompressor(content_encoding)
+    if decompressor is None:
+        return response_body
+    return decompressor.decompress(response_body) + decompressor.flush()
+
+
+# Define a class DecompressingStream to decompress a stream with read(), e.g. http.client.HTTPResponse, as it is read.
+# Each read gives at most size bytes decompressed, so that a highly compressed response is not inflated all at once.
+class DecompressingStream:
+    def __init__(self, stream, content_encoding, read_size=65536):
+        self.stream = stream
+        self.read_size = read_size
+        self._decompressor = get_decompressor(content_encoding)
+        # The end of the compressed stream, and the end of the decompressed data.
+        self._stream_eof = False
+        self.eof = False
+        # The number of compressed bytes read from the stream so far.
+        self.bytes_read = 0
+
+    # Read at most size decompressed bytes. An empty result means the end of the stream.
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self.read_size
+        while not self.eof:
+            data = self._decompressor.unconsumed_tail
+            if not data and not self._stream_eof:
+                data = self.stream.read(self.read_size)
+                self.bytes_read += len(data)
+                self._stream_eof = not data
+            # Once the stream has ended, the decompressor may still hold output, given by empty inputs.
+            decoded = self._decompressor.decompress(data, size)
+            if decoded:
+                return decoded
+            if self._stream_eof and not self._decompressor.unconsumed_tail:
+                self.eof = True
+                return self._decompressor.flush()
+        return b''
+
+
 #######################################
 #   Section 2 - Logger Configurator   #
 #######################################
+_logging_configured = False
+_logging_lock = threading.Lock()
+
+
 # Define a function to configure the logger for respective modules.
-def configure_logger():
-    # Open the api-logging file to get the dict of logging configuration.
-    with open('./zabbix-api-logging.yml', mode='r') as _logging_conf_file:
-        logging_conf = yaml.load(_logging_conf_file.read(), Loader=yaml.SafeLoader)
-    # Open the api-config file to get the dict of logger configuration.
-    _logger_conf = get_yaml()['logger_conf']
-    # Get the full name (path and filename) of log file, and put it into the dict of logging configuration.
-    logging_conf['handlers']['timedRotatingFileHandler']['filename'] = _logger_conf['log_file_fullname']
-    # Define the logger names to be used in the respective modules.
-    logger_name = _logger_conf['loggers'][str(os.path.basename(__file__)).replace('.py', '')]
-    # Configure the logger
-    logging.config.dictConfig(logging_conf)
+# The logging configuration is applied once per process. Later calls only pick up the logger of the module.
+def configure_logger(module_name='base_lib'):
+    global _logging_configured
+    # Get the dict of logger configuration from the api-config file.
+    _logger_conf = get_config().get_section('logger_conf')
+    with _logging_lock:
+        if not _logging_configured:
+            # Open the api-logging file to get the dict of logging configuration.
+            with open(_logger_conf.get('logging_conf_fullname') or './zabbix-api-logging.yml',
+                      mode='r') as _logging_conf_file:
+                logging_conf = yaml.load(_logging_conf_file.read(), Loader=yaml.SafeLoader)
+            # Get the full name (path and filename) of log file, and put it into the dict of logging configuration.
+            logging_conf['handlers']['timedRotatingFileHandler']['filename'] = _logger_conf['log_file_fullname']
+            # Configure the logger
+            logging.config.dictConfig(logging_conf)
+            _logging_configured = True
+    # Define the logger names to be used in the respective modules. A module missing from the config file, e.g. one
+    # added after the config file was deployed, uses the logger of base_lib.
+    _loggers = _logger_conf['loggers']
+    logger_name = _loggers.get(module_name, _loggers['base_lib'])
     my_logger = logging.getLogger(logger_name)
     return my_logger
 
 
+# Whether the full payloads and responses are logged, or only a summary per query (method, sizes, items, latency).
+# Full payloads are logged at DEBUG level only, and may contain the credential of user.login.
+def log_full_payloads():
+    return get_config().get_value('logger_conf', 'payload_logging', 'summary') == 'full' \
+        and logger.isEnabledFor(logging.DEBUG)
+
+
+# Log a one-line summary of a query, and record it in the metrics. decoded_bytes, the size of a compressed response
+# once decompressed.
+def log_query_summary(method, request_bytes, response_bytes, items, latency, decoded_bytes=None):
+    if decoded_bytes is not None and decoded_bytes != response_bytes:
+        logger.info('Query %s: sent %d bytes, received %d bytes (%d decompressed, %.1f%% saved), %d items, '
+                    'in %.3f secs.', method, request_bytes, response_bytes, decoded_bytes,
+                    100 * (1 - response_bytes / max(decoded_bytes, 1)), items, latency)
+        get_metrics().add_counter('response_bytes_saved', decoded_bytes - response_bytes)
+    else:
+        logger.info('Query %s: sent %d bytes, received %d bytes, %d items, in %.3f secs.',
+                    method, request_bytes, response_bytes, items, latency)
+    get_metrics().record_call(method, request_bytes, response_bytes, items, latency)
+
+
+# The number of items in a result, for the summary of a query.
+def count_result_items(response):
+    result = response.get('result') if isinstance(response, dict) else response
+    return len(result) if isinstance(result, list) else 1
+
+
 #######################################
 #       Section 3 - Zabbix URL        #
 #######################################
@@ -158,8 +490,7 @@ class ZabbixURL:
 
     # Try to parse the Zabbix API URL from the config file.
     def _parse_url_from_conf(self):
-        config = get_yaml()
-        conf_url = config['api_url']
+        conf_url = get_config().get_api_url()
         logger.debug('Got the URL from the api conf: %s. To be verified.' % conf_url)
         if conf_url is None:
             return None
@@ -205,10 +536,8 @@ class ZabbixCredential:
     # Try to parse the credential from the config file.
     @staticmethod
     def _parse_cred_from_conf():
-        config = get_yaml()
-        username = config['user']['username']
+        (username, password) = get_config().get_user_credential()
         logger.debug('Obtaining the username %s from config file. To be verified.' % username)
-        password = config['user']['password']
         logger.debug('Obtaining the password from config file. To be verified.')
         return username, password
 
@@ -245,15 +574,294 @@ class ZabbixCredential:
 
 
 #######################################
-#  Section 5 - Connection with Zabbix #
+#   Section 5 - HTTP Connection Pool  #
 #######################################
+# The errors raised when a kept-alive connection has been closed by the server in the meantime.
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected,
+                           http.client.CannotSendRequest,
+                           http.client.BadStatusLine,
+                           ConnectionResetError,
+                           ConnectionAbortedError,
+                           BrokenPipeError)
+
+
+_ssl_context = None
+_ssl_context_lock = threading.Lock()
+
+
+# Get the process-wide SSL context. It is built on the first call, based on the config file.
+def get_ssl_context():
+    global _ssl_context
+    with _ssl_context_lock:
+        if _ssl_context is None:
+            ca_file = get_config().get_value('ssl', 'ca_file')
+            ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+            ssl_context.minimum_version = ssl.TLSVersion.TLSv1_2
+            if get_config().get_bool('ssl', 'verify_certificate', False):
+                # Verify the certificate against the CA bundle in the config file, or the OS default trusted root store.
+                if ca_file:
+                    ssl_context.load_verify_locations(cafile=ca_file)
+                    logger.debug('Configured the SSL Context to load CA bundle %s.' % ca_file)
+                else:
+                    ssl_context.load_default_certs()
+                    logger.debug('Configured the SSL Context to load OS default trusted root store.')
+            else:
+                ssl_context.check_hostname = False
+                ssl_context.verify_mode = ssl.CERT_NONE
+                logger.debug('Configured the SSL Context not to verify the certificate of Zabbix.')
+            _ssl_context = ssl_context
+    return _ssl_context
+
+
+# Define a class TimeoutHTTPConnection to connect within the timeout given to the constructor, i.e. the connect
+# timeout, then to wait for each read no longer than read_timeout.
+class TimeoutHTTPConnection(http.client.HTTPConnection):
+    # The timeout (in secs) of socket reads and writes once connected. None means the connect timeout.
+    read_timeout = None
+
+    def connect(self):
+        super().connect()
+        if self.read_timeout is not None:
+            self.sock.settimeout(self.read_timeout)
+
+
+# Define a class ResumableHTTPSConnection to resume a previous TLS session when connecting.
+class ResumableHTTPSConnection(http.client.HTTPSConnection):
+    # TLS session to resume. None means a full handshake.
+    tls_session = None
+    # The timeout (in secs) of socket reads and writes once connected. None means the connect timeout.
+    read_timeout = None
+
+    def connect(self):
+        http.client.HTTPConnection.connect(self)
+        server_hostname = self._tunnel_host if self._tunnel_host else self.host
+        self.sock = self._context.wrap_socket(self.sock, server_hostname=server_hostname, session=self.tls_session)
+        if self.sock.session_reused:
+            logger.debug('Resumed the TLS session with host %s.', self.host)
+        if self.read_timeout is not None:
+            self.sock.settimeout(self.read_timeout)
+
+
+# Define a class ConnectionPool to reuse HTTP/1.1 keep-alive connections, keyed by (is_https, host, port).
+class ConnectionPool:
+    def __init__(self, max_connections, idle_timeout):
+        # The maximum number of connections opened at the same time, idle or in use.
+        self.max_connections = max_connections
+        # Idle connections older than idle_timeout (in secs) are not reused, as the server may have closed them.
+        self.idle_timeout = idle_timeout
+        # Idle connections per key, each of them is a list of (connection, time of release).
+        self._idle = {}
+        # The number of connections opened, idle or in use.
+        self._opened = 0
+        # The latest TLS session per key, to be resumed by new connections.
+        self._tls_sessions = {}
+        self._condition = threading.Condition()
+
+    def _new_connection(self, key, ssl_context, connect_timeout):
+        (is_https, host, port) = key
+        if is_https:
+            conn = ResumableHTTPSConnection(host, port=port, context=ssl_context, timeout=connect_timeout)
+            # Offer the TLS session of the previous connection to the same server, to skip the full handshake.
+            conn.tls_session = self._tls_sessions.get(key)
+        else:
+            conn = TimeoutHTTPConnection(host, port=port, timeout=connect_timeout)
+        logger.debug('Opened a new connection to host %s, port %s.', host, port)
+        return conn
+
+    # Close an idle connection of any key, to make room for a new connection. Must be called with the lock held.
+    def _close_one_idle(self):
+        for idle_conns in self._idle.values():
+            if idle_conns:
+                (conn, _) = idle_conns.pop(0)
+                conn.close()
+                self._opened -= 1
+                return True
+        return False
+
+    # Get a connection for the key. Return the connection, and whether it is a reused one.
+    def acquire(self, key, ssl_context, reuse=True):
+        # Get the connect timeout before taking room in the pool, as it raises an exception once the deadline passed.
+        connect_timeout = get_connect_timeout()
+        with self._condition:
+            while True:
+                idle_conns = self._idle.get(key, [])
+                while reuse and idle_conns:
+                    (conn, released_at) = idle_conns.pop()
+                    if time.monotonic() - released_at < self.idle_timeout:
+                        logger.debug('Reusing a kept-alive connection to host %s, port %s.', key[1], key[2])
+                        return conn, True
+                    conn.close()
+                    self._opened -= 1
+                if self._opened < self.max_connections or self._close_one_idle():
+                    self._opened += 1
+                    break
+                # All the connections are in use. Wait for one of them to be released.
+                logger.debug('All %d connections are in use. Waiting.', self.max_connections)
+                self._condition.wait()
+        try:
+            return self._new_connection(key, ssl_context, connect_timeout), False
+        except Exception:
+            with self._condition:
+                self._opened -= 1
+                self._condition.notify()
+            raise
+
+    # Put a connection back to the pool once its response has been fully read.
+    def release(self, key, conn):
+        with self._condition:
+            if isinstance(conn.sock, ssl.SSLSocket) and conn.sock.session is not None:
+                self._tls_sessions[key] = conn.sock.session
+            self._idle.setdefault(key, []).append((conn, time.monotonic()))
+            self._condition.notify()
+
+    # Close a broken or closing connection, and free its room in the pool.
+    def discard(self, conn):
+        conn.close()
+        with self._condition:
+            self._opened -= 1
+            self._condition.notify()
+
+    def close_all(self):
+        with self._condition:
+            for idle_conns in self._idle.values():
+                for (conn, _) in idle_conns:
+                    conn.close()
+                    self._opened -= 1
+            self._idle.clear()
+            self._condition.notify_all()
+
+
+_connection_pool = None
+_connection_pool_lock = threading.Lock()
+
+
+# Get the process-wide connection pool. It is created on the first call, based on the config file.
+def get_connection_pool():
+    global _connection_pool
+    with _connection_pool_lock:
+        if _connection_pool is None:
+            _connection_pool = ConnectionPool(get_config().get_int('connection_pool', 'max_connections', 8),
+                                              get_config().get_float('connection_pool', 'idle_timeout', 4))
+            atexit.register(_connection_pool.close_all)
+            logger.info('Created the connection pool with at most %d connections.'
+                        % _connection_pool.max_connections)
+    return _connection_pool
+
+
+#######################################
+#  Section 6 - Connection with Zabbix #
+#######################################
+# The HTTP status codes of a frontend under load or restarting, worth a retry.
+RETRYABLE_HTTP_STATUSES = (429, 502, 503, 504)
+
+# The errors worth a retry: timeouts, connections refused, reset or closed, and broken HTTP responses.
+# Other OSErrors, e.g. a CA bundle not found, are permanent.
+RETRYABLE_ERRORS = (TimeoutError, asyncio.TimeoutError, ConnectionError, http.client.HTTPException) \
+    + STALE_CONNECTION_ERRORS
+
+# The errors never worth a retry, even if they are among RETRYABLE_ERRORS, e.g. a certificate not trusted.
+NON_RETRYABLE_ERRORS = (ssl.SSLCertVerificationError,)
+
+
+# Define an exception TransientHTTPError for the HTTP status codes worth a retry.
+class TransientHTTPError(Exception):
+    pass
+
+
+_run_deadline = None
+
+
+# Start the deadline of the run, request.run_deadline secs from now, if it is set.
+def start_run_deadline():
+    global _run_deadline
+    run_deadline = get_config().get_value('request', 'run_deadline')
+    if run_deadline is not None:
+        run_deadline = float(run_deadline)
+        _run_deadline = time.monotonic() + run_deadline
+        logger.info('The run is to finish within %s secs.', run_deadline)
+
+
+# The secs left before the deadline of the run, or None if there is no deadline. Raise an exception once it passed.
+def get_run_time_left():
+    if _run_deadline is None:
+        return None
+    time_left = _run_deadline - time.monotonic()
+    if time_left <= 0:
+        logger.critical('The deadline of the run has passed.')
+        raise Exception('The deadline of the run has passed.')
+    return time_left
+
+
+# The timeout (in secs) to connect to Zabbix API, within the deadline of the run.
+def get_connect_timeout():
+    connect_timeout = get_config().get_float('request', 'connect_timeout', 10)
+    time_left = get_run_time_left()
+    return connect_timeout if time_left is None else min(connect_timeout, time_left)
+
+
+# The timeout (in secs) of each read from Zabbix API, within the deadline of the run.
+def get_read_timeout():
+    read_timeout = get_config().get_float('request', 'read_timeout', 60)
+    time_left = get_run_time_left()
+    return read_timeout if time_left is None else min(read_timeout, time_left)
+
+
+# Only the methods which read, e.g. event.get or apiinfo.version, are sent again after a failure.
+def is_idempotent_method(method):
+    return method is not None and (method.endswith('.get') or method == 'apiinfo.version')
+
+
+# The value of the Accept-Encoding header, i.e. the content codings of responses asked for, or None if
+# compression.response is disabled. br is asked for only if the package brotli is installed.
+def get_accept_encoding():
+    if not get_config().get_bool('compression', 'response', True):
+        return None
+    return 'br, gzip, deflate' if brotli is not None else 'gzip, deflate'
+
+
 # Define a class APIQuery to handle HTTP connections with Zabbix.
 class ConnectionWithZabbix:
-    def __init__(self, url, json_payload):
+    def __init__(self, url, json_payload, method=None, idempotent=None, bearer_token=None):
         # url, the URL of Zabbix API
         self.url = url
         # payload of HTTP request.
         self.json_payload = json_payload
+        # method of the query, for the logs.
+        self.method = method
+        # Whether the query can be sent again after a failure. By default, if the method only reads.
+        self.idempotent = is_idempotent_method(method) if idempotent is None else idempotent
+        # The token sent in the header Authorization: Bearer, instead of 'auth' in the payload, or None.
+        self.bearer_token = bearer_token
+        # The body of HTTP request and its content coding, built once by _get_request_body.
+        self._request_body = None
+        self._request_encoding = None
+
+    # Get the secs to wait before the next attempt of the query, with exponential backoff and full jitter.
+    # Raise the error instead if the query is not to be retried: not idempotent, out of retries, or out of time.
+    def _get_retry_delay(self, attempt, error):
+        config = get_config()
+        max_retries = config.get_int('request', 'max_retries', 3)
+        if not self.idempotent or attempt > max_retries or isinstance(error, NON_RETRYABLE_ERRORS):
+            raise error
+        delay = random.uniform(0, min(config.get_float('request', 'backoff_max', 10),
+                                      config.get_float('request', 'backoff_base', 0.5) * 2 ** (attempt - 1)))
+        time_left = get_run_time_left()
+        if time_left is not None and delay >= time_left:
+            raise error
+        logger.warning('Query %s failed (%s). Retry %d of %d in %.2f secs.',
+                       self.method, '%s: %s' % (error.__class__.__name__, error), attempt, max_retries, delay)
+        get_metrics().add_counter('api_retries')
+        return delay
+
+    # Run the function, and run it again after a delay if it fails with an error worth a retry.
+    def _retry(self, function):
+        attempt = 0
+        while True:
+            try:
+                return function()
+            except RETRYABLE_ERRORS + (TransientHTTPError,) as error:
+                attempt += 1
+                time.sleep(self._get_retry_delay(attempt, error))
 
     # Separate the URL to is_https, host, port and path.
     def _separate_url(self):
@@ -267,7 +875,7 @@ class ConnectionWithZabbix:
             host = self.url.replace('https://', '').partition(':')[0].partition('/')[0]
             port = self.url.replace('https://' + host, '').replace(':', '').partition('/')[0]
             path = self.url.replace('https://' + host, '').replace(':', '').replace(port, '')
-        logger.info('The URL is separated to is_https, host, port and path.')
+        logger.debug('The URL is separated to is_https, host, port and path.')
         return is_https, host, port, path
 
     # Get the configuration of HTTP query.
@@ -277,71 +885,409 @@ class ConnectionWithZabbix:
         headers = {
             'Content-Type': 'application/json',
             'User-Agent': 'Python/zabbix-api',
-            'Cache-Control': 'no-cache'
+            'Cache-Control': 'no-cache',
+            'Connection': 'keep-alive'
         }
+        accept_encoding = get_accept_encoding()
+        if accept_encoding is not None:
+            headers['Accept-Encoding'] = accept_encoding
+        if self.bearer_token is not None:
+            headers['Authorization'] = 'Bearer %s' % self.bearer_token
+        if self._get_request_body()[1] is not None:
+            headers['Content-Encoding'] = self._request_encoding
         return is_https, host, port, path, http_method, headers
 
-    # Build SSL context, if the connection is HTTPS.
+    # Get the body of HTTP request and its content coding. The payload is compressed with gzip if it is at least
+    # compression.request_min_size bytes. Otherwise, or if it is not set, the content coding is None.
+    def _get_request_body(self):
+        if self._request_body is None:
+            self._request_body = self.json_payload.encode('utf-8')
+            request_min_size = get_config().get_value('compression', 'request_min_size')
+            if request_min_size is not None and len(self._request_body) >= int(request_min_size):
+                compressed_body = gzip.compress(self._request_body, compresslevel=6)
+                logger.debug('Compressed the query %s from %d to %d bytes.',
+                             self.method, len(self._request_body), len(compressed_body))
+                get_metrics().add_counter('request_bytes_saved', len(self._request_body) - len(compressed_body))
+                (self._request_body, self._request_encoding) = (compressed_body, 'gzip')
+        return self._request_body, self._request_encoding
+
+    # Get the SSL context shared by all the HTTPS connections.
     @staticmethod
     def _build_ssl_context():
-        ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLSv1_2)
-        ssl_context.load_default_certs()
-        logger.debug('Configured the SSL Context to load OS default trusted root store.')
-        return ssl_context
+        return get_ssl_context()
 
-    # Initiate the HTTP(S) connection.
-    def _build_http_connection(self, is_https, host, port, path, http_method, headers, ssl_context):
-        # Check if port has a value.
-        if port == '':
-            port = None
-        # Check whether this is a HTTP or HTTPS connection.
-        if is_https:
-            conn = http.client.HTTPSConnection(host, port=port, context=ssl_context)
-        else:
-            conn = http.client.HTTPConnection(host, port=port)
-        # Initiate the connection.
+    # Send the HTTP request over the connection, and get the HTTP response.
+    def _send_http_request(self, conn, host, port, path, http_method, headers):
         try:
-            conn.request(http_method, path, self.json_payload, headers)
-            logger.info('Sent query to host %s, port %s, path, %s, Method %s, Headers %s, Payload %s'
-                        % (host, port, path, http_method, headers, self.json_payload))
+            # Wait for each read no longer than the read timeout, which shrinks as the deadline of the run nears.
+            conn.read_timeout = get_read_timeout()
+            if conn.sock is not None:
+                conn.sock.settimeout(conn.read_timeout)
+            conn.request(http_method, path, self._get_request_body()[0], headers)
+            if log_full_payloads():
+                logger.debug('Sent query to host %s, port %s, path, %s, Method %s, Headers %s, Payload %s',
+                             host, port, path, http_method, headers, self.json_payload)
+            else:
+                logger.debug('Sent query %s to host %s, port %s, path %s.', self.method, host, port, path)
+            return conn.getresponse()
+        # A kept-alive connection closed by the server. Let the caller reconnect.
+        except STALE_CONNECTION_ERRORS:
+            raise
         # Handle HTTP connection timeout error. Put it in the log.
         except TimeoutError:
-            logger.critical('HTTP connection to host %s, port %s, path %s has been time-out.'
-                            % (host, port, path))
+            logger.critical('HTTP connection to host %s, port %s, path %s has been time-out.', host, port, path)
+            raise
         # Handle other unknown errors. Put it in the log.
         except Exception as unknown_error:
-            logger.critical(
-                'HTTP connection to host %s, port %s, path %s has failed. Error: %s.'
-                % (host, port, path, unknown_error))
-        return conn
+            logger.critical('HTTP connection to host %s, port %s, path %s has failed. Error: %s.',
+                            host, port, path, unknown_error)
+            raise
 
-    # Parse the HTTP response.
+    # Get a connection from the pool and send the request. Reconnect once if a reused connection turns out stale.
+    def _build_http_connection(self, is_https, host, port, path, http_method, headers, ssl_context):
+        # Check if port has a value.
+        if port == '':
+            port = None
+        key = (is_https, host, port)
+        pool = get_connection_pool()
+        (conn, reused) = pool.acquire(key, ssl_context)
+        try:
+            response = self._send_http_request(conn, host, port, path, http_method, headers)
+        except STALE_CONNECTION_ERRORS as stale_error:
+            pool.discard(conn)
+            if not reused:
+                raise
+            logger.info('The kept-alive connection to host %s, port %s is stale (%s). Reconnecting.',
+                        host, port, stale_error)
+            (conn, reused) = pool.acquire(key, ssl_context, reuse=False)
+            try:
+                response = self._send_http_request(conn, host, port, path, http_method, headers)
+            except Exception:
+                pool.discard(conn)
+                raise
+        except Exception:
+            pool.discard(conn)
+            raise
+        return key, conn, response
+
+    # Verify if the status code of HTTP response is 200. If not, this is a bad response. Put it in the log.
     @staticmethod
-    def _parse_http_response(conn, host, port, path):
-        response = conn.getresponse()
-        logger.info('Received the response from host %s, port %s, path %s.' % (host, port, path))
-        # Verify if the status code of HTTP response is 200. If not, this is a bad response. Put it in the log.
+    def _verify_http_status(response, host, port, path):
+        logger.debug('Received the response from host %s, port %s, path %s.', host, port, path)
+        if response.getcode() in RETRYABLE_HTTP_STATUSES:
+            logger.error('HTTP response status code is %d. The server may be busy.', response.getcode())
+            raise TransientHTTPError('HTTP error in the response from host %s, port %s, path %s, status code: %s'
+                                     % (host, port, path, response.getcode()))
         if response.getcode() != 200:
-            logger.critical('HTTP response status code is %d. Raise an exception.' % response.getcode())
+            logger.critical('HTTP response status code is %d. Raise an exception.', response.getcode())
             raise Exception('HTTP error in the response from host %s, port %s, path %s, status code: %s'
                             % (host, port, path, response.getcode()))
+
+    # Parse the HTTP response.
+    def _parse_http_response(self, response, host, port, path):
+        self._verify_http_status(response, host, port, path)
+        # The HTTP status code is fine. Decompress and parse the JSON content to a Python object.
+        response_body = response.read()
+        decoded_body = decode_response_body(response_body, response.getheader('Content-Encoding'))
+        data = get_json_codec().loads(decoded_body)
+        if log_full_payloads():
+            logger.debug('content received from host %s, port %s, path %s: %s', host, port, path, data)
+        return data, len(response_body), len(decoded_body)
+
+    # The main method to line up the methods above. An idempotent query is retried after an error worth a retry.
+    def connect_zabbix(self):
+        return self._retry(self._connect_zabbix_once)
+
+    def _connect_zabbix_once(self):
+        start_time = time.monotonic()
+        (is_https, host, port, path, http_method, headers) = self._get_http_config()
+        (key, conn, response) = self._build_http_connection(is_https, host, port, path, http_method, headers,
+                                                            self._build_ssl_context())
+        pool = get_connection_pool()
+        try:
+            (data, response_bytes, decoded_bytes) = self._parse_http_response(response, host, port, path)
+        except Exception:
+            pool.discard(conn)
+            raise
+        # The response has been fully read. Keep the connection for the next query, unless the server closes it.
+        if response.will_close:
+            pool.discard(conn)
+        else:
+            pool.release(key, conn)
+        log_query_summary(self.method, len(self._get_request_body()[0]), response_bytes, count_result_items(data),
+                          time.monotonic() - start_time, decoded_bytes)
+        return data
+
+    # Send the request, and get the response with a good status, to be parsed while it is being received.
+    def _open_streamed_response(self, is_https, host, port, path, http_method, headers):
+        (key, conn, response) = self._build_http_connection(is_https, host, port, path, http_method, headers,
+                                                            self._build_ssl_context())
+        try:
+            self._verify_http_status(response, host, port, path)
+        except Exception:
+            get_connection_pool().discard(conn)
+            raise
+        return key, conn, response
+
+    # The streaming counterpart of connect_zabbix. Yield the elements of 'result' as they are parsed from the socket.
+    # An idempotent query is retried after an error worth a retry, as long as no element has been yielded.
+    def iter_zabbix_result(self):
+        start_time = time.monotonic()
+        items = 0
+        (is_https, host, port, path, http_method, headers) = self._get_http_config()
+        (key, conn, response) = self._retry(lambda: self._open_streamed_response(is_https, host, port, path,
+                                                                                 http_method, headers))
+        pool = get_connection_pool()
+        completed = False
+        try:
+            # A compressed response is decompressed as it is parsed.
+            content_encoding = response.getheader('Content-Encoding')
+            stream = response if get_decompressor(content_encoding) is None \
+                else DecompressingStream(response, content_encoding)
+            parser = StreamingResultParser(stream)
+            for item in parser.iter_result():
+                items += 1
+                yield item
+            # Drain the trailing whitespace, so that the connection can be reused.
+            response_bytes = parser.bytes_read if stream is response else stream.bytes_read
+            response_bytes += len(response.read())
+            completed = True
+            log_query_summary(self.method, len(self._get_request_body()[0]), response_bytes, items,
+                              time.monotonic() - start_time, parser.bytes_read)
+        finally:
+            # A response not fully read, e.g. the caller stopped iterating, leaves the connection unusable.
+            if completed and not response.will_close:
+                pool.release(key, conn)
+            else:
+                pool.discard(conn)
+
+
+#######################################
+#    Section 7 - Asyncio Connection   #
+#######################################
+# Define a class AsyncConnectionPool to keep the asyncio connections of one event loop, and bound the in-flight queries.
+class AsyncConnectionPool:
+    def __init__(self, max_in_flight):
+        # The maximum number of queries in flight at the same time.
+        self.max_in_flight = max_in_flight
+        self.semaphore = asyncio.BoundedSemaphore(max_in_flight)
+        # Idle connections per key (is_https, host, port), each of them is a tuple (reader, writer).
+        self._idle = {}
+
+    # Get an idle connection for the key, or open a new one. Return the connection, and whether it is a reused one.
+    async def acquire(self, key, ssl_context, reuse=True):
+        idle_conns = self._idle.get(key, [])
+        while reuse and idle_conns:
+            (reader, writer) = idle_conns.pop()
+            if not reader.at_eof() and not writer.is_closing():
+                return (reader, writer), True
+            writer.close()
+        (is_https, host, port) = key
+        if is_https:
+            conn = await asyncio.open_connection(host, port or 443, ssl=ssl_context, server_hostname=host)
+        else:
+            conn = await asyncio.open_connection(host, port or 80)
+        logger.debug('Opened a new asyncio connection to host %s, port %s.', host, port)
+        return conn, False
+
+    # Put a connection back to the pool once its response has been fully read.
+    def release(self, key, conn):
+        self._idle.setdefault(key, []).append(conn)
+
+    # Close a broken or closing connection.
+    @staticmethod
+    def discard(conn):
+        conn[1].close()
+
+    def close_all(self):
+        for idle_conns in self._idle.values():
+            for (_, writer) in idle_conns:
+                writer.close()
+        self._idle.clear()
+
+
+# The asyncio connection pool of each event loop. Asyncio objects must not be shared across event loops.
+_async_connection_pools = weakref.WeakKeyDictionary()
+
+
+# Get the asyncio connection pool of the running event loop. It is created on the first call, based on the config file.
+def get_async_connection_pool():
+    loop = asyncio.get_running_loop()
+    if loop not in _async_connection_pools:
+        _async_connection_pools[loop] = AsyncConnectionPool(get_config().get_int('async_query', 'max_in_flight', 16))
+        logger.info('Created the asyncio connection pool with at most %d queries in flight.'
+                    % _async_connection_pools[loop].max_in_flight)
+    return _async_connection_pools[loop]
+
+
+# Close the idle asyncio connections of the running event loop. To be awaited before the event loop is closed.
+async def close_async_connections():
+    get_async_connection_pool().close_all()
+    await asyncio.sleep(0)
+
+
+# Define a class AsyncConnectionWithZabbix to handle HTTP connections with Zabbix on asyncio.
+# URL handling and HTTP config are inherited from ConnectionWithZabbix.
+class AsyncConnectionWithZabbix(ConnectionWithZabbix):
+    # Wait for a read no longer than the read timeout, i.e. the longest silence of the server, as the sync path does.
+    @staticmethod
+    async def _read(read_coroutine):
+        return await asyncio.wait_for(read_coroutine, get_read_timeout())
+
+    # Send the HTTP request over the connection, and read the HTTP response. Return status code, headers and body.
+    async def _exchange(self, conn, host, port, path, http_method, headers):
+        (reader, writer) = conn
+        body = self._get_request_body()[0]
+        request_lines = ['%s %s HTTP/1.1' % (http_method, path),
+                         'Host: %s' % (host if port is None else '%s:%s' % (host, port)),
+                         'Content-Length: %d' % len(body)]
+        request_lines += ['%s: %s' % (header, value) for (header, value) in headers.items()]
+        writer.write(('\r\n'.join(request_lines) + '\r\n\r\n').encode('latin-1') + body)
+        await self._read(writer.drain())
+        if log_full_payloads():
+            logger.debug('Sent query to host %s, port %s, path, %s, Method %s, Headers %s, Payload %s',
+                         host, port, path, http_method, headers, self.json_payload)
+        else:
+            logger.debug('Sent query %s to host %s, port %s, path %s.', self.method, host, port, path)
+        # Status line. An empty one means the server has closed the kept-alive connection.
+        status_line = await self._read(reader.readline())
+        if not status_line:
+            raise http.client.RemoteDisconnected('Remote end closed connection without response')
+        status_code = int(status_line.split()[1])
+        # Headers, with lower case names.
+        response_headers = {}
+        while True:
+            header_line = await self._read(reader.readline())
+            if header_line in (b'\r\n', b'\n', b''):
+                break
+            (name, _, value) = header_line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+        # Body, either chunked, with a Content-Length, or till the server closes the connection.
+        if response_headers.get('transfer-encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                chunk_size = int((await self._read(reader.readline())).split(b';')[0], 16)
+                if chunk_size == 0:
+                    await self._read(reader.readline())
+                    break
+                chunks.append(await self._read(reader.readexactly(chunk_size)))
+                await self._read(reader.readline())
+            response_body = b''.join(chunks)
+        elif 'content-length' in response_headers:
+            # Read the body bit by bit, so that the read timeout applies to each read, not to the whole body.
+            content_length = int(response_headers['content-length'])
+            chunks = []
+            while content_length > 0:
+                chunk = await self._read(reader.read(min(content_length, 65536)))
+                if not chunk:
+                    raise asyncio.IncompleteReadError(b''.join(chunks), content_length)
+                chunks.append(chunk)
+                content_length -= len(chunk)
+            response_body = b''.join(chunks)
+        else:
+            chunks = []
+            while True:
+                chunk = await self._read(reader.read(65536))
+                if not chunk:
+                    break
+                chunks.append(chunk)
+            response_body = b''.join(chunks)
+            response_headers['connection'] = 'close'
+        return status_code, response_headers, response_body
+
+    # Parse the HTTP response, decompressed.
+    @staticmethod
+    def _parse_async_http_response(status_code, response_body, host, port, path):
+        logger.debug('Received the response from host %s, port %s, path %s.', host, port, path)
+        # Verify if the status code of HTTP response is 200. If not, this is a bad response. Put it in the log.
+        if status_code in RETRYABLE_HTTP_STATUSES:
+            logger.error('HTTP response status code is %d. The server may be busy.', status_code)
+            raise TransientHTTPError('HTTP error in the response from host %s, port %s, path %s, status code: %s'
+                                     % (host, port, path, status_code))
+        if status_code != 200:
+            logger.critical('HTTP response status code is %d. Raise an exception.', status_code)
+            raise Exception('HTTP error in the response from host %s, port %s, path %s, status code: %s'
+                            % (host, port, path, status_code))
         # The HTTP status code is fine. Parse the JSON content to a Python object.
         else:
-            data = json.loads(response.read())
-            logger.debug('content received from host %s, port %s, path %s: %s' % (host, port, path, data))
+            data = get_json_codec().loads(response_body)
+            if log_full_payloads():
+                logger.debug('content received from host %s, port %s, path %s: %s', host, port, path, data)
             return data
 
-    # The main method to line up the methods above.
-    def connect_zabbix(self):
+    # The main method to line up the methods above. An idempotent query is retried after an error worth a retry.
+    async def connect_zabbix(self):
+        attempt = 0
+        while True:
+            try:
+                return await self._connect_zabbix_once()
+            except RETRYABLE_ERRORS + (TransientHTTPError,) as error:
+                attempt += 1
+                await asyncio.sleep(self._get_retry_delay(attempt, error))
+
+    # Send the query once. Reconnect once if a reused connection turns out stale. The connect timeout applies to
+    # getting a connection, and the read timeout to each read of the response.
+    async def _connect_zabbix_once(self):
+        start_time = time.monotonic()
         (is_https, host, port, path, http_method, headers) = self._get_http_config()
-        conn = self._build_http_connection(is_https, host, port, path, http_method, headers, self._build_ssl_context())
-        data = self._parse_http_response(conn, host, port, path)
+        # Check if port has a value.
+        if port == '':
+            port = None
+        key = (is_https, host, port)
+        pool = get_async_connection_pool()
+        async with pool.semaphore:
+            (conn, reused) = await asyncio.wait_for(
+                pool.acquire(key, self._build_ssl_context() if is_https else None), get_connect_timeout())
+            try:
+                try:
+                    (status_code, response_headers, response_body) = \
+                        await self._exchange(conn, host, port, path, http_method, headers)
+                except STALE_CONNECTION_ERRORS + (asyncio.IncompleteReadError,) as stale_error:
+                    pool.discard(conn)
+                    if not reused:
+                        raise
+                    logger.info('The kept-alive connection to host %s, port %s is stale (%s). Reconnecting.',
+                                host, port, stale_error)
+                    (conn, reused) = await asyncio.wait_for(
+                        pool.acquire(key, self._build_ssl_context() if is_https else None, reuse=False),
+                        get_connect_timeout())
+                    (status_code, response_headers, response_body) = \
+                        await self._exchange(conn, host, port, path, http_method, headers)
+                decoded_body = decode_response_body(response_body, response_headers.get('content-encoding')) \
+                    if status_code == 200 else response_body
+                data = self._parse_async_http_response(status_code, decoded_body, host, port, path)
+            except Exception:
+                pool.discard(conn)
+                raise
+            # The response has been fully read. Keep the connection for the next query, unless the server closes it.
+            if response_headers.get('connection', '').lower() == 'close':
+                pool.discard(conn)
+            else:
+                pool.release(key, conn)
+        log_query_summary(self.method, len(self._get_request_body()[0]), len(response_body),
+                          count_result_items(data), time.monotonic() - start_time, len(decoded_body))
         return data
 
 
 #####################################
-#  Section 6 - Meta Class of Query  #
+#  Section 8 - Meta Class of Query  #
 #####################################
+# The URLs of Zabbix API taking the token in the header Authorization: Bearer instead of 'auth' in the payload, i.e.
+# Zabbix 6.4 and above, which deprecates 'auth' and drops it since 7.2. Set by user.ZabbixSession, knowing the version.
+_bearer_auth_urls = set()
+
+
+def set_bearer_auth(url, enabled):
+    if enabled:
+        _bearer_auth_urls.add(url)
+    else:
+        _bearer_auth_urls.discard(url)
+
+
+def uses_bearer_auth(url):
+    return url in _bearer_auth_urls
+
+
 # Define a class MetaClassForQuery to form an API query to Zabbix.
 class MetaClassForQuery:
     def __init__(self, url, token, params):
@@ -354,19 +1300,29 @@ class MetaClassForQuery:
         # parameters in the query payload. Can be retrieved by parsing configuration, or passed from an instance.
         self.params = params
 
-    # Form the basic structure of query payload.
-    def _generate_payload(self):
-        logger.debug('Creating the base payload dict.')
+    # Form the basic structure of query payload, as a Python dict. The token is in 'auth', unless it is sent in the
+    # header Authorization: Bearer.
+    def _generate_python_payload(self):
         python_payload = {
             'jsonrpc': '2.0',
             'method': self.method,
             'params': self.params,
-            'auth': self.token,
             'id': random.randint(0, 1000)
         }
+        if not uses_bearer_auth(self.url):
+            python_payload['auth'] = self.token
+        return python_payload
+
+    # Get the token to send in the header Authorization: Bearer, or None if it is sent in 'auth' or there is none.
+    def _get_bearer_token(self):
+        return self.token if uses_bearer_auth(self.url) else None
+
+    # Form the query payload as a JSON object.
+    def _generate_payload(self):
         # Transfer from a python object to a JSON object.
-        json_payload = json.dumps(python_payload)
-        logger.info('JSON payload generated, content: %s' % json_payload)
+        json_payload = get_json_codec().dumps(self._generate_python_payload())
+        if log_full_payloads():
+            logger.debug('JSON payload generated, content: %s', json_payload)
         return json_payload
 
     def _verify_params(self):
@@ -385,11 +1341,11 @@ class MetaClassForQuery:
                                    response['error']['data']))
                 raise Exception('Got an error from Zabbix. Please refer to logs for details.')
             else:
-                logger.critical('Got NO result from the response. Unknown issue. Content: %s' % response)
+                logger.critical('Got NO result from the response. Unknown issue. Content: %.1000s', response)
                 raise Exception('Got NO result. Unknown issue. Please refer to logs for details.')
         # A good response with 'result'.
         else:
-            logger.info('Got results from the API response.')
+            logger.debug('Got results from the API response.')
 
     def _verify_result_advanced(self, response):
         # Keep the method to allow child classes to override this method.
@@ -399,18 +1355,422 @@ class MetaClassForQuery:
         # Verify if query payload parameters are valid or not. If not, it may stop processing.
         self._verify_params()
 
-        # Send HTTP request to Zabbix and get the HTTP response.
-        request = ConnectionWithZabbix(self.url, self._generate_payload())
-        response = request.connect_zabbix()
+        try:
+            # Send HTTP request to Zabbix and get the HTTP response.
+            request = ConnectionWithZabbix(self.url, self._generate_payload(), self.method,
+                                           bearer_token=self._get_bearer_token())
+            response = request.connect_zabbix()
+
+            # Basic verification with the response.
+            self._verify_result_basic(response)
+            # Advanced verification with result may take place with child classes.
+            self._verify_result_advanced(response)
+        except Exception:
+            get_metrics().record_error(self.method)
+            raise
+
+        return response['result']
+
+    # The streaming counterpart of api_query. Yield the elements of the result one by one, as they are parsed from
+    # the response, so that memory stays bounded whatever the size of the result. The advanced verification does not
+    # apply, as the whole result is never held.
+    def api_query_iter(self):
+        # Verify if query payload parameters are valid or not. If not, it may stop processing.
+        self._verify_params()
+
+        # Send HTTP request to Zabbix and parse the HTTP response while it is being received.
+        request = ConnectionWithZabbix(self.url, self._generate_payload(), self.method,
+                                       bearer_token=self._get_bearer_token())
+        try:
+            yield from request.iter_zabbix_result()
+        except Exception:
+            get_metrics().record_error(self.method)
+            raise
 
-        # Basic verification with the response.
-        self._verify_result_basic(response)
-        # Advanced verification with result may take place with child classes.
-        self._verify_result_advanced(response)
+    # The asyncio counterpart of api_query, with the same payload and verification.
+    async def api_query_async(self):
+        # Verify if query payload parameters are valid or not. If not, it may stop processing.
+        self._verify_params()
+
+        try:
+            # Send HTTP request to Zabbix and get the HTTP response.
+            request = AsyncConnectionWithZabbix(self.url, self._generate_payload(), self.method,
+                                                bearer_token=self._get_bearer_token())
+            response = await request.connect_zabbix()
+
+            # Basic verification with the response.
+            self._verify_result_basic(response)
+            # Advanced verification with result may take place with child classes.
+            self._verify_result_advanced(response)
+        except Exception:
+            get_metrics().record_error(self.method)
+            raise
 
         return response['result']
 
 
+#####################################
+#      Section 9 - Batch Query      #
+#####################################
+# Define a class BatchQuery to send several queries in JSON-RPC 2.0 batches, i.e. JSON arrays in one HTTP request.
+class BatchQuery:
+    def __init__(self, url, queries):
+        # url, the URL of Zabbix API
+        self.url = url
+        # queries, a list of instances of MetaClassForQuery's child classes.
+        self.queries = queries
+        # The maximum size of a batch payload. Larger batches are split.
+        self.max_payload_bytes = get_config().get_int('batch_query', 'max_payload_bytes', 1048576)
+
+    # Form the payload of every query, with its position in the queries as a deterministic id.
+    def _generate_json_payloads(self):
+        json_payloads = []
+        for request_id, query in enumerate(self.queries):
+            python_payload = query._generate_python_payload()
+            python_payload['id'] = request_id
+            json_payloads.append(get_json_codec().dumps(python_payload))
+        return json_payloads
+
+    # Split the payloads into batches, each of them within max_payload_bytes unless a single payload is larger.
+    # The size is the one of the UTF-8 body sent, as some codecs write non-ASCII characters unescaped.
+    def _split_batches(self, json_payloads):
+        batches = []
+        batch = []
+        batch_size = 2
+        for json_payload in json_payloads:
+            payload_size = len(json_payload.encode('utf-8'))
+            if batch and batch_size + payload_size + 1 > self.max_payload_bytes:
+                batches.append(batch)
+                batch = []
+                batch_size = 2
+            batch.append(json_payload)
+            batch_size += payload_size + 1
+        if batch:
+            batches.append(batch)
+        return batches
+
+    # Send the batches to Zabbix. Return the responses, keyed by id.
+    def _send_batches(self, batches):
+        responses = {}
+        for batch in batches:
+            json_payload = '[' + ','.join(batch) + ']'
+            logger.debug('JSON batch payload generated, %d queries, %d bytes.', len(batch),
+                         len(json_payload.encode('utf-8')))
+            # The queries of a batch share the header, so they share the token of the session.
+            request = ConnectionWithZabbix(self.url, json_payload, 'batch',
+                                           all(is_idempotent_method(query.method) for query in self.queries),
+                                           next((query._get_bearer_token() for query in self.queries
+                                                 if query._get_bearer_token() is not None), None))
+            try:
+                batch_response = request.connect_zabbix()
+                # A server rejecting the whole batch answers with a single error object.
+                if not isinstance(batch_response, list):
+                    MetaClassForQuery._verify_result_basic(batch_response)
+                    raise Exception('Got an unexpected response to a batch query. Please refer to logs for details.')
+            except Exception:
+                get_metrics().record_error('batch')
+                raise
+            for response in batch_response:
+                responses[response.get('id')] = response
+        return responses
+
+    def api_query(self):
+        # Verify if query payload parameters of every query are valid or not. If not, it may stop processing.
+        for query in self.queries:
+            query._verify_params()
+
+        # Send HTTP requests to Zabbix and get the responses.
+        batches = self._split_batches(self._generate_json_payloads())
+        logger.info('%d queries are split into %d batches.' % (len(self.queries), len(batches)))
+        responses = self._send_batches(batches)
+
+        # Match the responses back to the queries by id, and verify them with the respective query classes.
+        results = []
+        for request_id, query in enumerate(self.queries):
+            if request_id not in responses:
+                logger.critical('Got NO response for query %d, method %s in the batch.' % (request_id, query.method))
+                raise Exception('Got NO response for a query in the batch. Please refer to logs for details.')
+            try:
+                query._verify_result_basic(responses[request_id])
+                query._verify_result_advanced(responses[request_id])
+            except Exception:
+                get_metrics().record_error(query.method)
+                raise
+            results.append(responses[request_id]['result'])
+        return results
+
+
+# Run the queries, each in its own HTTP request, by up to 'workers' threads. Return their results in order.
+def api_query_concurrently(queries, workers=1):
+    if workers > 1 and len(queries) > 1:
+        # Threads share the connection pool. More threads than connections would only wait for each other.
+        if workers > get_connection_pool().max_connections:
+            logger.warning('%d workers but at most %d connections in the pool. Consider raising max_connections.'
+                           % (workers, get_connection_pool().max_connections))
+        logger.info('Running %d queries with %d workers.' % (len(queries), workers))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix='query') as executor:
+            return list(executor.map(lambda query: query.api_query(), queries))
+    else:
+        return [query.api_query() for query in queries]
+
+
+# Run the queries against the same URL and return their results in order.
+# They are sent in JSON-RPC batches if enabled in the config file, or otherwise one by one, by up to 'workers' threads.
+def api_query_all(url, queries, workers=1):
+    if get_config().get_bool('batch_query', 'enabled', False):
+        return BatchQuery(url, queries).api_query()
+    else:
+        return api_query_concurrently(queries, workers)
+
+
+#####################################
+#       Section 10 - Metrics        #
+#####################################
+# Define a class Metrics to record the API calls per method (counts, errors, bytes, items and a latency histogram),
+# the time spent per stage of a run and other counters, for the summary at the end of a run and a Prometheus
+# text-format file, e.g. for the textfile collector of node exporter.
+class Metrics:
+    # The upper bounds (in secs) of the buckets of the latency histogram.
+    LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.start_time = time.time()
+        # method -> dict of the figures of the calls.
+        self.calls = {}
+        # stage -> secs.
+        self.stages = {}
+        # name -> value.
+        self.counters = {}
+
+    def _get_method_calls(self, method):
+        if method not in self.calls:
+            self.calls[method] = {'count': 0, 'errors': 0, 'request_bytes': 0, 'response_bytes': 0, 'items': 0,
+                                  'latency_sum': 0.0, 'latency_max': 0.0,
+                                  'buckets': [0] * len(self.LATENCY_BUCKETS)}
+        return self.calls[method]
+
+    # Record a call answered by Zabbix.
+    def record_call(self, method, request_bytes, response_bytes, items, latency):
+        with self._lock:
+            method_calls = self._get_method_calls(method)
+            method_calls['count'] += 1
+            method_calls['request_bytes'] += request_bytes
+            method_calls['response_bytes'] += response_bytes
+            method_calls['items'] += items
+            method_calls['latency_sum'] += latency
+            method_calls['latency_max'] = max(method_calls['latency_max'], latency)
+            for (index, upper_bound) in enumerate(self.LATENCY_BUCKETS):
+                if latency <= upper_bound:
+                    method_calls['buckets'][index] += 1
+                    break
+
+    # Record a call failed, either in the HTTP exchange or by an error from Zabbix.
+    def record_error(self, method):
+        with self._lock:
+            self._get_method_calls(method)['errors'] += 1
+
+    def add_stage_time(self, stage, secs):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + secs
+
+    def add_counter(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    # Log the summary of the run, one line per method, stage and counter.
+    def log_summary(self):
+        with self._lock:
+            for (method, method_calls) in sorted(self.calls.items()):
+                logger.info('Metrics of %s: %d calls, %d errors, sent %d bytes, received %d bytes, %d items, '
+                            'latency mean %.3f secs, max %.3f secs.',
+                            method, method_calls['count'], method_calls['errors'], method_calls['request_bytes'],
+                            method_calls['response_bytes'], method_calls['items'],
+                            method_calls['latency_sum'] / max(method_calls['count'], 1), method_calls['latency_max'])
+            for (stage, secs) in self.stages.items():
+                logger.info('Metrics of stage %s: %.3f secs.', stage, secs)
+            for (name, value) in sorted(self.counters.items()):
+                logger.info('Metrics of %s: %s.', name, value)
+
+    @staticmethod
+    def _escape_label(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    # Form the metrics in the Prometheus text format.
+    def to_prometheus(self):
+        lines = []
+
+        def add_metric(name, metric_type, description, samples):
+            lines.append('# HELP %s %s' % (name, description))
+            lines.append('# TYPE %s %s' % (name, metric_type))
+            for (labels, value) in samples:
+                label_text = ','.join('%s="%s"' % (label, self._escape_label(label_value))
+                                      for (label, label_value) in labels)
+                lines.append('%s%s %s' % (name, '{%s}' % label_text if label_text else '', repr(value)))
+
+        with self._lock:
+            methods = sorted(self.calls.items())
+            for (figure, name, description) in (
+                    ('count', 'zabbix_api_calls_total', 'Zabbix API calls by method.'),
+                    ('errors', 'zabbix_api_call_errors_total', 'Failed Zabbix API calls by method.'),
+                    ('request_bytes', 'zabbix_api_request_bytes_total', 'Bytes sent to Zabbix API by method.'),
+                    ('response_bytes', 'zabbix_api_response_bytes_total', 'Bytes received from Zabbix API by method.'),
+                    ('items', 'zabbix_api_result_items_total', 'Items in the results of Zabbix API by method.')):
+                add_metric(name, 'counter', description,
+                           [((('method', method),), method_calls[figure]) for (method, method_calls) in methods])
+            histogram_samples = []
+            for (method, method_calls) in methods:
+                cumulative_count = 0
+                for (upper_bound, bucket_count) in zip(self.LATENCY_BUCKETS, method_calls['buckets']):
+                    cumulative_count += bucket_count
+                    histogram_samples.append(('_bucket', (('method', method), ('le', repr(upper_bound))),
+                                              cumulative_count))
+                histogram_samples.append(('_bucket', (('method', method), ('le', '+Inf')),
+                                          method_calls['count']))
+                histogram_samples.append(('_sum', (('method', method),), method_calls['latency_sum']))
+                histogram_samples.append(('_count', (('method', method),), method_calls['count']))
+            lines.append('# HELP zabbix_api_call_duration_seconds Latency of Zabbix API calls by method.')
+            lines.append('# TYPE zabbix_api_call_duration_seconds histogram')
+            for (suffix, labels, value) in histogram_samples:
+                lines.append('zabbix_api_call_duration_seconds%s{%s} %s' % (
+                    suffix, ','.join('%s="%s"' % (label, self._escape_label(label_value))
+                                     for (label, label_value) in labels), repr(value)))
+            add_metric('zabbix_api_stage_duration_seconds', 'gauge', 'Time spent per stage of the last run.',
+                       [((('stage', stage),), secs) for (stage, secs) in self.stages.items()])
+            for (name, value) in sorted(self.counters.items()):
+                add_metric('zabbix_api_%s_total' % name, 'counter', 'Number of %s in the last run.'
+                           % name.replace('_', ' '), [((), value)])
+            add_metric('zabbix_api_run_duration_seconds', 'gauge', 'Duration of the last run.',
+                       [((), time.time() - self.start_time)])
+            add_metric('zabbix_api_run_end_timestamp_seconds', 'gauge', 'Unix time of the end of the last run.',
+                       [((), time.time())])
+        return '\n'.join(lines) + '\n'
+
+    # Write the metrics to a Prometheus text-format file atomically, as the textfile collector may read it any time.
+    def write_prometheus_textfile(self, path):
+        temp_path = path + '.tmp'
+        with open(temp_path, mode='w') as prom_file:
+            prom_file.write(self.to_prometheus())
+        os.replace(temp_path, path)
+        logger.info('Wrote the metrics to %s.', path)
+
+
+_metrics = Metrics()
+
+
+# Get the process-wide metrics.
+def get_metrics():
+    return _metrics
+
+
+# Log the summary of the metrics, and write them to the Prometheus text-format file if metrics.prometheus_textfile
+# is set. Called at the end of a run.
+def report_metrics():
+    get_metrics().log_summary()
+    prometheus_textfile = get_config().get_value('metrics', 'prometheus_textfile')
+    if prometheus_textfile is not None:
+        get_metrics().write_prometheus_textfile(prometheus_textfile)
+
+
+#####################################
+#      Section 11 - JSON Codec      #
+#####################################
+# Define a class JsonCodec to encode the payloads of queries to str and decode the responses, from bytes or str,
+# with the json of the standard library. The other codecs inherit from it, with a faster library.
+class JsonCodec:
+    name = 'json'
+
+    @staticmethod
+    def is_available():
+        return True
+
+    @staticmethod
+    def dumps(python_object):
+        return json.dumps(python_object)
+
+    @staticmethod
+    def loads(data):
+        return json.loads(data)
+
+
+# orjson encodes to bytes, which are decoded to str for the payload. It decodes bytes without a str in between.
+class OrjsonCodec(JsonCodec):
+    name = 'orjson'
+
+    @staticmethod
+    def is_available():
+        return orjson is not None
+
+    @staticmethod
+    def dumps(python_object):
+        return orjson.dumps(python_object).decode('utf-8')
+
+    @staticmethod
+    def loads(data):
+        return orjson.loads(data)
+
+
+# simdjson only decodes. The payloads are encoded with the json of the standard library.
+class SimdjsonCodec(JsonCodec):
+    name = 'simdjson'
+
+    @staticmethod
+    def is_available():
+        return simdjson is not None
+
+    @staticmethod
+    def loads(data):
+        return simdjson.loads(data)
+
+
+class UjsonCodec(JsonCodec):
+    name = 'ujson'
+
+    @staticmethod
+    def is_available():
+        return ujson is not None
+
+    @staticmethod
+    def dumps(python_object):
+        return ujson.dumps(python_object, escape_forward_slashes=False)
+
+    @staticmethod
+    def loads(data):
+        return ujson.loads(data)
+
+
+# The codecs by name, in the order of preference of json_codec.codec auto.
+JSON_CODECS = {
+    'orjson': OrjsonCodec,
+    'simdjson': SimdjsonCodec,
+    'ujson': UjsonCodec,
+    'json': JsonCodec
+}
+
+
+# Get the JSON codec of json_codec.codec. With auto, the first one installed in the order of JSON_CODECS.
+@functools.lru_cache(maxsize=None)
+def _select_json_codec(codec_name):
+    if codec_name == 'auto':
+        json_codec = next(codec for codec in JSON_CODECS.values() if codec.is_available())
+    elif codec_name not in JSON_CODECS:
+        logger.critical('Unknown JSON codec %s.', codec_name)
+        raise Exception('Unknown JSON codec %s. It should be auto or one of %s.'
+                        % (codec_name, ', '.join(JSON_CODECS)))
+    else:
+        json_codec = JSON_CODECS[codec_name]
+        if not json_codec.is_available():
+            logger.critical('The JSON codec %s needs the package %s, which is not installed.', codec_name, codec_name)
+            raise Exception('The JSON codec %s needs the package %s, which is not installed.'
+                            % (codec_name, codec_name))
+    logger.info('Encoding and decoding JSON with %s.', json_codec.name)
+    return json_codec
+
+
+def get_json_codec():
+    return _select_json_codec(get_config().get_value('json_codec', 'codec', 'auto'))
+
+
 #####################################
 #       Logging Configuration       #
 #####################################
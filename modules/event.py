@@ -26,7 +26,7 @@ class EventGet(base_lib.MetaClassForQuery):
     def _verify_params(self):
         # event.get query must have a certain timeframe. Verifying it.
         if not ('eventids' in self.params
-                or ('eventid_from' in self.params and 'eventid_till' in self.params)
+                or ('eventid_from' in self.params and ('eventid_till' in self.params or 'time_till' in self.params))
                 or ('time_from' in self.params and 'time_till' in self.params)):
             # No certain timeframe defined. Exit.
             logger.error('No certain timeframe defined in the parameters. Raise an exception')
@@ -40,4 +40,4 @@ class EventGet(base_lib.MetaClassForQuery):
 #####################################
 #       Logging Configuration       #
 #####################################
-logger = base_lib.configure_logger()
+logger = base_lib.configure_logger('event')
@@ -0,0 +1,228 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : output_writer.py
+
+"""
+Table of Content:
+    Section 1 - Text Writers
+    Section 2 - Parquet Writer
+    Section 3 - Writer Selection
+    Logging Configuration
+"""
+
+import csv
+import gzip
+import io
+import json
+import os
+
+from modules import base_lib
+
+# zstandard and pyarrow are optional. They are needed only to write .zst and .parquet files respectively.
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+#####################################
+#     Section 1 - Text Writers      #
+#####################################
+# Define a class TextWriter to write rows to a text file, compressed or not, which CsvWriter and JsonLinesWriter
+# inherit from. With an offset, the file is truncated to the offset and the rows are appended after it.
+# An uncompressed file can be committed at any row. A compressed one only when it is closed, as the compressed data
+# is complete only at the end of the gzip member or zstd frame. The rows of a later run go to a new member or frame.
+class TextWriter:
+    # The compression, None, 'gzip' or 'zstd'.
+    compression = None
+    # The file can be appended to by a later run, e.g. an incremental export.
+    supports_append = True
+
+    def __init__(self, filename, headers, column_types=None, offset=None):
+        self.filename = filename
+        self.headers = headers
+        if offset is not None:
+            os.truncate(filename, offset)
+            self.raw_file = open(filename, mode='ab')
+        else:
+            self.raw_file = open(filename, mode='wb')
+        self.compressed_file = self._open_compressed_file()
+        self.text_file = io.TextIOWrapper(self.compressed_file or self.raw_file, encoding='utf-8', newline='')
+        if offset is None:
+            self.write_header()
+
+    def _open_compressed_file(self):
+        if self.compression is None:
+            return None
+        if self.compression == 'gzip':
+            return gzip.GzipFile(fileobj=self.raw_file, mode='wb')
+        if zstandard is None:
+            logger.critical('Writing %s needs the package zstandard, which is not installed.', self.filename)
+            raise Exception('Writing %s needs the package zstandard, which is not installed.' % self.filename)
+        return zstandard.ZstdCompressor().stream_writer(self.raw_file, closefd=False)
+
+    def write_header(self):
+        pass
+
+    def write_row(self, values):
+        raise Exception('write_row is not implemented by %s.' % self.__class__.__name__)
+
+    # Flush the rows written so far to the OS. A compressed file is flushed to a block boundary, readable so far.
+    def flush(self):
+        self.text_file.flush()
+        if self.compressed_file is not None:
+            self.compressed_file.flush()
+        self.raw_file.flush()
+
+    # Flush the rows written so far to disk. Return the offset to append after, or None if it cannot be committed.
+    def commit(self):
+        self.flush()
+        if self.compressed_file is not None:
+            return None
+        os.fsync(self.raw_file.fileno())
+        return self.raw_file.tell()
+
+    # Close the file, also to disk if sync. Return the offset to append after.
+    def close(self, sync=False):
+        self.text_file.flush()
+        self.text_file.detach()
+        if self.compressed_file is not None:
+            self.compressed_file.close()
+        self.raw_file.flush()
+        if sync:
+            os.fsync(self.raw_file.fileno())
+        offset = self.raw_file.tell()
+        self.raw_file.close()
+        return offset
+
+
+# Define a class CsvWriter to write rows to a CSV file, with the headers in the first line.
+class CsvWriter(TextWriter):
+    def __init__(self, filename, headers, column_types=None, offset=None):
+        self.csv_writer = None
+        super().__init__(filename, headers, column_types, offset)
+
+    def write_header(self):
+        self._get_csv_writer().writerow(self.headers)
+
+    def write_row(self, values):
+        self._get_csv_writer().writerow(values)
+
+    def _get_csv_writer(self):
+        if self.csv_writer is None:
+            self.csv_writer = csv.writer(self.text_file)
+        return self.csv_writer
+
+
+class GzipCsvWriter(CsvWriter):
+    compression = 'gzip'
+
+
+class ZstdCsvWriter(CsvWriter):
+    compression = 'zstd'
+
+
+# Define a class JsonLinesWriter to write rows to a JSON Lines file, i.e. one JSON object of headers: values per line.
+# Values not in JSON, e.g. datetime, are written as strings, as in CSV files.
+class JsonLinesWriter(TextWriter):
+    def write_row(self, values):
+        self.text_file.write(json.dumps(dict(zip(self.headers, values)), default=str, ensure_ascii=False))
+        self.text_file.write('\n')
+
+
+class GzipJsonLinesWriter(JsonLinesWriter):
+    compression = 'gzip'
+
+
+#####################################
+#    Section 2 - Parquet Writer     #
+#####################################
+# Define a class ParquetWriter to write rows to a Parquet file, buffering them column by column and writing them in
+# row groups of output.parquet_row_group_size rows. A Parquet file is complete only when it is closed, so it can
+# neither be committed in the middle nor appended to.
+class ParquetWriter:
+    supports_append = False
+
+    def __init__(self, filename, headers, column_types=None, offset=None):
+        if pyarrow is None:
+            logger.critical('Writing %s needs the package pyarrow, which is not installed.', filename)
+            raise Exception('Writing %s needs the package pyarrow, which is not installed.' % filename)
+        if offset is not None:
+            raise Exception('A Parquet file cannot be appended to. File: %s' % filename)
+        self.filename = filename
+        self.headers = headers
+        # column_types, a dict of header: 'string', 'int' or 'timestamp'. A column is a string by default.
+        arrow_types = {'string': pyarrow.string(), 'int': pyarrow.int64(), 'timestamp': pyarrow.timestamp('s')}
+        self.schema = pyarrow.schema([(header, arrow_types[(column_types or {}).get(header, 'string')])
+                                      for header in headers])
+        self.row_group_size = base_lib.get_config().get_int('output', 'parquet_row_group_size', 50000)
+        self.columns = [[] for _ in headers]
+        self.parquet_writer = pyarrow.parquet.ParquetWriter(filename, self.schema)
+
+    def write_row(self, values):
+        for (column, field, value) in zip(self.columns, self.schema, values):
+            if value is not None and pyarrow.types.is_string(field.type):
+                value = str(value)
+            column.append(value)
+        if len(self.columns[0]) >= self.row_group_size:
+            self._write_row_group()
+
+    def _write_row_group(self):
+        if not self.columns[0]:
+            return
+        self.parquet_writer.write_table(pyarrow.Table.from_arrays(
+            [pyarrow.array(column, type=field.type) for (column, field) in zip(self.columns, self.schema)],
+            schema=self.schema))
+        logger.debug('Wrote a row group of %d rows to %s.', len(self.columns[0]), self.filename)
+        self.columns = [[] for _ in self.headers]
+
+    # The rows are flushed by row groups only, so as not to write tiny row groups.
+    def flush(self):
+        pass
+
+    def commit(self):
+        return None
+
+    def close(self, sync=False):
+        self._write_row_group()
+        self.parquet_writer.close()
+        if sync:
+            with open(self.filename, mode='rb') as parquet_file:
+                os.fsync(parquet_file.fileno())
+        return os.path.getsize(self.filename)
+
+
+#####################################
+#    Section 3 - Writer Selection   #
+#####################################
+# The writer of each output filename suffix. They are the suffixes accepted by base_lib.CsvFilename.
+WRITERS = {
+    '.csv': CsvWriter,
+    '.csv.gz': GzipCsvWriter,
+    '.csv.zst': ZstdCsvWriter,
+    '.jsonl': JsonLinesWriter,
+    '.jsonl.gz': GzipJsonLinesWriter,
+    '.parquet': ParquetWriter
+}
+
+
+# Get the writer class of the output file, by the suffix of its filename. The longest suffix matching wins.
+def get_writer_class(filename):
+    for suffix in sorted(WRITERS, key=len, reverse=True):
+        if filename.lower().endswith(suffix):
+            return WRITERS[suffix]
+    logger.error('No writer for the output file %s.', filename)
+    raise Exception('No writer for the output file %s. The suffix should be one of %s.'
+                    % (filename, ', '.join(WRITERS)))
+
+
+#####################################
+#       Logging Configuration       #
+#####################################
+logger = base_lib.configure_logger('output_writer')
@@ -41,4 +41,4 @@ class ProblemGet(base_lib.MetaClassForQuery):
 #####################################
 #       Logging Configuration       #
 #####################################
-logger = base_lib.configure_logger()
+logger = base_lib.configure_logger('problem')
@@ -6,15 +6,104 @@
 
 """
 Table of Content:
-    Section 1 - trigger.get
+    Section 1 - Trigger Cache
+    Section 2 - trigger.get
     Logging Configuration
 """
 
+import sqlite3
+import threading
+import time
+import json
+import hashlib
+
 from modules import base_lib
 
 
 #####################################
-#      Section 1 - trigger.get      #
+#     Section 1 - Trigger Cache     #
+#####################################
+# Define a TriggerCache class to keep the results of trigger.get in a local SQLite file, across runs.
+# Entries are keyed by URL, trigger.get parameters and triggerid, expire after ttl secs, and the least recently
+# used ones are evicted beyond max_entries.
+class TriggerCache:
+    def __init__(self, path, ttl, max_entries):
+        # path, the path of the SQLite file.
+        self.path = path
+        # ttl, the time to live of an entry, in secs.
+        self.ttl = ttl
+        # max_entries, the maximum number of entries kept in the cache.
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute('CREATE TABLE IF NOT EXISTS triggers ('
+                         'url TEXT, params_key TEXT, triggerid TEXT, content TEXT, fetched_at REAL, accessed_at REAL, '
+                         'PRIMARY KEY (url, params_key, triggerid))')
+        self._db.execute('CREATE INDEX IF NOT EXISTS triggers_accessed_at ON triggers (accessed_at)')
+        self._db.commit()
+
+    # The key of trigger.get parameters other than triggerids, as the cached content depends on them.
+    @staticmethod
+    def build_params_key(params):
+        other_params = {key: value for (key, value) in params.items() if key != 'triggerids'}
+        return hashlib.sha1(json.dumps(other_params, sort_keys=True).encode('utf-8')).hexdigest()
+
+    # Get the triggers in the cache and not expired, as a dict triggerid -> trigger.
+    def get_many(self, url, params_key, triggerids):
+        now = time.time()
+        cached_triggers = {}
+        with self._lock:
+            for triggerid in triggerids:
+                row = self._db.execute('SELECT content FROM triggers '
+                                       'WHERE url = ? AND params_key = ? AND triggerid = ? AND fetched_at > ?',
+                                       (url, params_key, triggerid, now - self.ttl)).fetchone()
+                if row is not None:
+                    cached_triggers[triggerid] = json.loads(row[0])
+            self._db.executemany('UPDATE triggers SET accessed_at = ? '
+                                 'WHERE url = ? AND params_key = ? AND triggerid = ?',
+                                 [(now, url, params_key, triggerid) for triggerid in cached_triggers])
+            self._db.commit()
+        return cached_triggers
+
+    # Put the triggers to the cache. Drop the expired entries, and evict the least recently used ones beyond the cap.
+    def put_many(self, url, params_key, triggers):
+        now = time.time()
+        with self._lock:
+            self._db.executemany('INSERT OR REPLACE INTO triggers VALUES (?, ?, ?, ?, ?, ?)',
+                                 [(url, params_key, the_trigger['triggerid'], json.dumps(the_trigger), now, now)
+                                  for the_trigger in triggers])
+            self._db.execute('DELETE FROM triggers WHERE fetched_at <= ?', (now - self.ttl,))
+            self._db.execute('DELETE FROM triggers WHERE rowid IN '
+                             '(SELECT rowid FROM triggers ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                             (self.max_entries,))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_trigger_cache = None
+_trigger_cache_lock = threading.Lock()
+
+
+# Get the process-wide trigger cache, or None if it is disabled in the config file.
+def get_trigger_cache():
+    global _trigger_cache
+    config = base_lib.get_config()
+    if not config.get_bool('trigger_cache', 'enabled', False):
+        return None
+    with _trigger_cache_lock:
+        if _trigger_cache is None:
+            _trigger_cache = TriggerCache(config.get_value('trigger_cache', 'path', './zabbix-api-cache.sqlite'),
+                                          config.get_float('trigger_cache', 'ttl', 86400),
+                                          config.get_int('trigger_cache', 'max_entries', 100000))
+            logger.info('Opened the trigger cache %s.', _trigger_cache.path)
+    return _trigger_cache
+
+
+#####################################
+#      Section 2 - trigger.get      #
 #####################################
 # Define a TriggerGet class for calling Zabbix API trigger.get, and inherited from MetaClassForQuery from basic_lib.
 class TriggerGet(base_lib.MetaClassForQuery):
@@ -22,10 +111,35 @@ class TriggerGet(base_lib.MetaClassForQuery):
         super().__init__(url, token, params)
         self.method = 'trigger.get'
 
+    # Override the method to consult the trigger cache first, if enabled. trigger.get is called only for the
+    # triggerids missing or expired in the cache.
+    def api_query(self):
+        cache = get_trigger_cache()
+        if cache is None or 'triggerids' not in self.params:
+            return super().api_query()
+        triggerids = self.params['triggerids']
+        triggerids = [str(triggerid) for triggerid in (triggerids if isinstance(triggerids, list) else [triggerids])]
+        params_key = cache.build_params_key(self.params)
+        cached_triggers = cache.get_many(self.url, params_key, triggerids)
+        missing_triggerids = [triggerid for triggerid in triggerids if triggerid not in cached_triggers]
+        logger.info('%d triggers found in the cache, %d to get from Zabbix.',
+                    len(cached_triggers), len(missing_triggerids))
+        triggers = list(cached_triggers.values())
+        if missing_triggerids:
+            all_params = self.params
+            self.params = dict(all_params, triggerids=missing_triggerids)
+            try:
+                fetched_triggers = super().api_query()
+            finally:
+                self.params = all_params
+            cache.put_many(self.url, params_key, fetched_triggers)
+            triggers += fetched_triggers
+        return triggers
+
     # Other methods are inherited from the Parent class 'MetaClassForQuery'.
 
 
 #####################################
 #       Logging Configuration       #
 #####################################
-logger = base_lib.configure_logger()
+logger = base_lib.configure_logger('trigger')
@@ -8,13 +8,20 @@
 Table of Content:
     Section 1 - user.login
     Section 2 - user.logout
+    Section 3 - user.checkAuthentication
+    Section 4 - Session
     Logging Configuration
 """
 
-import json
 import random
+import os
+import json
+import hashlib
+import hmac
+import threading
 
 from modules import base_lib
+from modules import apiinfo
 
 
 #####################################
@@ -22,9 +29,11 @@ from modules import base_lib
 #####################################
 # Define a UserLogin class for calling Zabbix API user.login, and inherited from MetaClassForQuery from basic_lib.
 class UserLogin(base_lib.MetaClassForQuery):
-    def __init__(self, url):
+    def __init__(self, url, credential=None):
         # url, the URL of Zabbix API
         self.url = url
+        # credential, the (username, password) already got, or None to get it from config file or user input.
+        self.credential = credential
         # There is no token before login.
         self.token = None
         # method to call Zabbix APIs.
@@ -32,27 +41,28 @@ class UserLogin(base_lib.MetaClassForQuery):
         # Create an empty dict for params.
         self.params = {}
 
-    def _generate_payload(self):
-        # Get the credential either from config file or user input.
-        credential = base_lib.ZabbixCredential()
-        (username, password) = credential.get_cred()
+    def _generate_python_payload(self):
+        # Get the credential either from config file or user input, unless given.
+        if self.credential is None:
+            self.credential = base_lib.ZabbixCredential().get_cred()
+        (username, password) = self.credential
 
-        # Create the base payload.
+        # The parameter 'user' is renamed 'username' since Zabbix 5.4, and the former is dropped since 6.4.
+        username_param = 'username' if apiinfo.get_zabbix_version(self.url) >= (5, 4) else 'user'
+
+        # Create the base payload. 'auth' is deprecated since Zabbix 6.4, and dropped since 7.2.
         python_payload = {
             'jsonrpc': '2.0',
             'method': self.method,
             'params': {
-                'user': username,
+                username_param: username,
                 'password': password
             },
-            'id': random.randint(0, 1000),
-            'auth': self.token
+            'id': random.randint(0, 1000)
         }
-
-        # Transfer from a python object to a JSON object.
-        json_payload = json.dumps(python_payload)
-        logger.info('JSON payload generated, content: %s' % json_payload)
-        return json_payload
+        if apiinfo.get_zabbix_version(self.url) < (6, 4):
+            python_payload['auth'] = self.token
+        return python_payload
 
     # Other methods are inherited from the Parent class 'MetaClassForQuery'.
 
@@ -80,7 +90,158 @@ class UserLogout(base_lib.MetaClassForQuery):
     # Other methods are inherited from the Parent class 'MetaClassForQuery'.
 
 
+########################################
+# Section 3 - user.checkAuthentication #
+########################################
+# Define a UserCheckAuthentication class for calling Zabbix API user.checkAuthentication, to verify a session is still
+# valid. Inherited from MetaClassForQuery from basic_lib.
+class UserCheckAuthentication(base_lib.MetaClassForQuery):
+    def __init__(self, url, sessionid):
+        # url, the URL of Zabbix API
+        self.url = url
+        # The method does not take a token, but the session to check in its params.
+        self.token = None
+        # method to call Zabbix APIs.
+        self.method = 'user.checkAuthentication'
+        # The session ID to check.
+        self.params = {'sessionid': sessionid}
+
+    def _generate_python_payload(self):
+        # Create the base payload, without 'auth'.
+        python_payload = {
+            'jsonrpc': '2.0',
+            'method': self.method,
+            'params': self.params,
+            'id': random.randint(0, 1000)
+        }
+        return python_payload
+
+    # Return True if the session is valid, or False if Zabbix rejects it, e.g. expired or logged out.
+    def api_query(self):
+        # Send HTTP request to Zabbix and get the HTTP response.
+        request = base_lib.ConnectionWithZabbix(self.url, self._generate_payload(), self.method)
+        response = request.connect_zabbix()
+        if 'result' not in response:
+            logger.info('The session is no longer valid. Message: %s', response.get('error', {}).get('data'))
+            return False
+        return True
+
+
+#####################################
+#        Section 4 - Session        #
+#####################################
+# Define a class SessionTokenCache to keep the session tokens of Zabbix APIs in a file, readable by the owner only,
+# so that later runs reuse the session instead of logging in again. A session is kept with the username and a salted
+# hash of the password it was opened with, and reused only with the same credential, so that another user or a
+# rotated password logs in again.
+class SessionTokenCache:
+    def __init__(self, path):
+        # The path of the cache file, which holds a JSON object of URL: {username, salt, digest, token}.
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _load_all(self):
+        try:
+            # The file is ignored if others may read or write it, as the tokens are as good as the password.
+            if os.stat(self.path).st_mode & 0o077:
+                logger.warning('The token cache %s is accessible by others. Ignore it.', self.path)
+                return {}
+            with open(self.path, mode='r') as cache_file:
+                return json.load(cache_file)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            logger.warning('The token cache %s is corrupted. Ignore it.', self.path)
+            return {}
+
+    def _save_all(self, tokens):
+        # Write a temporary file with the owner-only permission, then move it in place atomically. The permission is
+        # set again in case a temporary file of a former run was left with another one.
+        temp_path = self.path + '.tmp'
+        fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.fchmod(fd, 0o600)
+        with os.fdopen(fd, mode='w') as cache_file:
+            json.dump(tokens, cache_file)
+        os.replace(temp_path, self.path)
+
+    @staticmethod
+    def _hash_password(password, salt):
+        return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), bytes.fromhex(salt), 100000).hex()
+
+    # Get the cached session of the URL, if it was opened with the credential (username, password).
+    def get(self, url, credential):
+        (username, password) = credential
+        with self._lock:
+            entry = self._load_all().get(url)
+        # Entries of former versions hold the token only, of an unknown user.
+        if not isinstance(entry, dict) or entry.get('username') != username:
+            return None
+        try:
+            digest = self._hash_password(password, entry.get('salt', ''))
+        except ValueError:
+            logger.warning('The token cache %s is corrupted. Ignore it.', self.path)
+            return None
+        if not hmac.compare_digest(entry.get('digest', ''), digest):
+            logger.info('The password differs from the one of the cached session. Not reusing it.')
+            return None
+        return entry.get('token')
+
+    def put(self, url, credential, token):
+        (username, password) = credential
+        salt = os.urandom(16).hex()
+        with self._lock:
+            tokens = self._load_all()
+            tokens[url] = {'username': username, 'salt': salt, 'digest': self._hash_password(password, salt),
+                           'token': token}
+            self._save_all(tokens)
+
+
+# Define a class ZabbixSession to get the token to call Zabbix API with, and to release it when done.
+# An API token from the config file is used as is, without login or logout. Since Zabbix 6.4, the token, either an
+# API token or a session, is sent in the header Authorization: Bearer instead of 'auth' in the payload.
+# With the token cache enabled, a still valid session of a former run by the same credential is reused, and the session
+# is kept at the end for the next run. Otherwise, it logs in and out as usual.
+class ZabbixSession:
+    def __init__(self, url):
+        # url, the URL of Zabbix API
+        self.url = url
+        self.token = None
+        config = base_lib.get_config()
+        self.api_token = config.get_value('user', 'api_token')
+        self.token_cache = None
+        if config.get_bool('token_cache', 'enabled', False):
+            self.token_cache = SessionTokenCache(config.get_value('token_cache', 'path', './zabbix-api-token.cache'))
+
+    def open(self):
+        base_lib.set_bearer_auth(self.url, apiinfo.get_zabbix_version(self.url) >= (6, 4))
+        if self.api_token is not None:
+            logger.info('Using the API token from config file. No login.')
+            self.token = self.api_token
+            return self.token
+        if self.token_cache is None:
+            # Get the token after login - may be interactive.
+            self.token = UserLogin(self.url).api_query()
+            return self.token
+        # The credential is got first, as the cached session is reused only by the same user with the same password.
+        credential = base_lib.ZabbixCredential().get_cred()
+        cached_token = self.token_cache.get(self.url, credential)
+        if cached_token is not None and UserCheckAuthentication(self.url, cached_token).api_query():
+            logger.info('Reusing the cached session.')
+            self.token = cached_token
+            return self.token
+        self.token = UserLogin(self.url, credential).api_query()
+        self.token_cache.put(self.url, credential, self.token)
+        return self.token
+
+    def close(self):
+        # The API token and the cached session are left open.
+        if self.api_token is not None or self.token_cache is not None:
+            return
+        logout = UserLogout(self.url, self.token)
+        logout.api_query()
+
+
 #####################################
 #       Logging Configuration       #
 #####################################
-logger = base_lib.configure_logger()
+logger = base_lib.configure_logger('user')
@@ -0,0 +1,123 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_batch_query.py
+
+"""
+Regression tests of BatchQuery of base_lib: the split of the queries into batches within max_payload_bytes, and the
+match of the responses back to the queries by id, whatever their order (user-005).
+"""
+
+import json
+import unittest
+from unittest import mock
+
+import testing_config  # noqa: F401, writes the config of the tests before base_lib loads it.
+from modules import base_lib
+
+URL = 'http://127.0.0.1/api_jsonrpc.php'
+
+
+# Define a query whose result is its params, to tell the results apart.
+class EchoQuery(base_lib.MetaClassForQuery):
+    def __init__(self, params):
+        super().__init__(URL, 'token', params)
+        self.method = 'event.get'
+
+
+# Define a fake ConnectionWithZabbix answering every batch with the responses in the reverse order. The responses
+# of the ids in drop_ids are left out, and the ones in error_ids are error objects.
+class FakeBatchConnection:
+    payloads = []
+    drop_ids = set()
+    error_ids = set()
+
+    def __init__(self, url, json_payload, method=None, idempotent=None, bearer_token=None):
+        self.json_payload = json_payload
+        FakeBatchConnection.payloads.append(json_payload)
+
+    def connect_zabbix(self):
+        responses = []
+        for request in reversed(json.loads(self.json_payload)):
+            if request['id'] in self.drop_ids:
+                continue
+            if request['id'] in self.error_ids:
+                responses.append({'jsonrpc': '2.0', 'id': request['id'],
+                                  'error': {'code': -32602, 'message': 'Invalid params.', 'data': 'Bad query.'}})
+            else:
+                responses.append({'jsonrpc': '2.0', 'result': request['params'], 'id': request['id']})
+        return responses
+
+
+class TestBatchQuery(unittest.TestCase):
+    def setUp(self):
+        FakeBatchConnection.payloads = []
+        FakeBatchConnection.drop_ids = set()
+        FakeBatchConnection.error_ids = set()
+        patcher = mock.patch.object(base_lib, 'ConnectionWithZabbix', FakeBatchConnection)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _run_batch(self, queries, max_payload_bytes):
+        batch_query = base_lib.BatchQuery(URL, queries)
+        batch_query.max_payload_bytes = max_payload_bytes
+        return batch_query.api_query()
+
+    def test_results_matched_by_id(self):
+        queries = [EchoQuery({'eventids': [str(index)]}) for index in range(50)]
+        results = self._run_batch(queries, 400)
+        self.assertEqual(results, [query.params for query in queries])
+        self.assertGreater(len(FakeBatchConnection.payloads), 1)
+        # The ids are the positions of the queries, each sent exactly once.
+        ids = [request['id'] for payload in FakeBatchConnection.payloads for request in json.loads(payload)]
+        self.assertEqual(sorted(ids), list(range(50)))
+
+    # With every codec installed, some of which write non-ASCII characters unescaped.
+    def test_batches_within_max_payload_bytes(self):
+        queries = [EchoQuery({'search': {'name': 'Température du serveur %d' % index}}) for index in range(50)]
+        for json_codec in base_lib.JSON_CODECS.values():
+            if not json_codec.is_available():
+                continue
+            FakeBatchConnection.payloads = []
+            with mock.patch.object(base_lib, 'get_json_codec', return_value=json_codec):
+                self.assertEqual(self._run_batch(queries, 500), [query.params for query in queries])
+            for payload in FakeBatchConnection.payloads:
+                self.assertLessEqual(len(payload.encode('utf-8')), 500, json_codec.name)
+
+    # The limit is on the bytes sent. Codecs like orjson write non-ASCII characters as is, 3 bytes each here.
+    def test_split_counts_utf8_bytes(self):
+        batch_query = base_lib.BatchQuery(URL, [])
+        batch_query.max_payload_bytes = 100
+        json_payloads = ['"%s"' % ('服' * 10)] * 5
+        batches = batch_query._split_batches(json_payloads)
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        for batch in batches:
+            self.assertLessEqual(len(('[' + ','.join(batch) + ']').encode('utf-8')), 100)
+
+    # A payload larger than the limit is sent alone, instead of not at all.
+    def test_split_oversized_payload(self):
+        batch_query = base_lib.BatchQuery(URL, [])
+        batch_query.max_payload_bytes = 10
+        self.assertEqual(batch_query._split_batches(['"a"', '"%s"' % ('b' * 20), '"c"']),
+                         [['"a"'], ['"%s"' % ('b' * 20)], ['"c"']])
+
+    def test_missing_response(self):
+        FakeBatchConnection.drop_ids = {7}
+        with self.assertRaisesRegex(Exception, 'Got NO response'):
+            self._run_batch([EchoQuery({'eventids': [str(index)]}) for index in range(10)], 1048576)
+
+    def test_error_response(self):
+        FakeBatchConnection.error_ids = {3}
+        with self.assertRaisesRegex(Exception, 'Got an error from Zabbix'):
+            self._run_batch([EchoQuery({'eventids': [str(index)]}) for index in range(10)], 1048576)
+
+    # A server rejecting the whole batch answers with a single error object instead of an array.
+    def test_batch_rejected(self):
+        rejection = {'jsonrpc': '2.0', 'id': None,
+                     'error': {'code': -32600, 'message': 'Invalid request.', 'data': 'Batch not supported.'}}
+        with mock.patch.object(FakeBatchConnection, 'connect_zabbix', return_value=rejection):
+            with self.assertRaisesRegex(Exception, 'Got an error from Zabbix'):
+                self._run_batch([EchoQuery({'eventids': ['1']})], 1048576)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_decompression.py
+
+"""
+Regression tests of the decoding of compressed HTTP responses, whole or streamed (user-024).
+"""
+
+import gzip
+import io
+import json
+import unittest
+import zlib
+
+import testing_config  # noqa: F401, writes the config of the tests before base_lib loads it.
+from modules import base_lib
+
+
+# The bodies of each content coding, the one of br only if brotli is installed.
+def compress_body(response_body):
+    compressed_bodies = {'gzip': gzip.compress(response_body), 'deflate': zlib.compress(response_body)}
+    if base_lib.brotli is not None:
+        compressed_bodies['br'] = base_lib.brotli.compress(response_body)
+    return compressed_bodies
+
+
+class TestDecompression(unittest.TestCase):
+    def setUp(self):
+        result = [{'eventid': str(1000 + index), 'name': 'Problème %d' % index,
+                   'tags': [{'tag': 'type', 'value': 'T%d' % (index % 4)}]} for index in range(5000)]
+        self.result = result
+        self.response_body = json.dumps({'jsonrpc': '2.0', 'result': result, 'id': 1}).encode('utf-8')
+
+    def test_decode_response_body(self):
+        self.assertEqual(base_lib.decode_response_body(self.response_body, None), self.response_body)
+        self.assertEqual(base_lib.decode_response_body(self.response_body, 'identity'), self.response_body)
+        for (content_encoding, compressed_body) in compress_body(self.response_body).items():
+            self.assertEqual(base_lib.decode_response_body(compressed_body, content_encoding.upper()),
+                             self.response_body)
+
+    def test_unsupported_content_encoding(self):
+        with self.assertRaises(Exception):
+            base_lib.decode_response_body(b'', 'compress')
+
+    # Each read inflates at most about size bytes, however compressed the response. brotli rounds the limit up to its
+    # internal blocks, of 32 KiB at most.
+    def test_streamed_reads_are_bounded(self):
+        for (content_encoding, compressed_body) in compress_body(self.response_body).items():
+            for (read_size, size) in ((1, 100), (7, 65536), (1024, 1), (65536, 65536)):
+                stream = base_lib.DecompressingStream(io.BytesIO(compressed_body), content_encoding, read_size)
+                chunks = []
+                while True:
+                    chunk = stream.read(size)
+                    if not chunk:
+                        break
+                    self.assertLessEqual(len(chunk), 2 * max(size, 32768) if content_encoding == 'br' else size)
+                    chunks.append(chunk)
+                self.assertEqual(b''.join(chunks), self.response_body, (content_encoding, read_size, size))
+                self.assertEqual(stream.bytes_read, len(compressed_body))
+
+    def test_streamed_parsing(self):
+        for (content_encoding, compressed_body) in compress_body(self.response_body).items():
+            for read_size in (1, 7, 65536):
+                stream = base_lib.DecompressingStream(io.BytesIO(compressed_body), content_encoding, read_size)
+                parser = base_lib.StreamingResultParser(stream, 1000)
+                self.assertEqual(list(parser.iter_result()), self.result, (content_encoding, read_size))
+
+
+if __name__ == "__main__":
+    unittest.main()
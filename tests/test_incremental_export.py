@@ -0,0 +1,166 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_incremental_export.py
+
+"""
+Regression tests of the incremental export of event_export_csv: the checkpoint, the resume from the eventid of the
+checkpoint, and the truncation of the rows written after the last commit by a crashed run (user-014).
+"""
+
+import csv
+import datetime
+import gzip
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import testing_config  # noqa: F401, writes the config of the tests before base_lib loads it.
+import event_export_csv
+
+
+# An enriched event as write_events takes it, with only the attributes it needs.
+def make_row(eventid, clock):
+    event_row = event_export_csv.EventRow({'eventid': str(eventid), 'r_eventid': '0', 'severity': '1',
+                                           'name': 'problem %d' % eventid})
+    event_row.time = datetime.datetime.fromtimestamp(clock)
+    return event_row
+
+
+# Yield the rows of the eventids, and raise as a crashed run does after them, if crash.
+def iter_rows(eventids, crash=False):
+    for eventid in eventids:
+        yield make_row(eventid, 1600000000 + eventid)
+    if crash:
+        raise RuntimeError('Crashed.')
+
+
+# Read the eventids written to the output file, compressed or not.
+def read_eventids(output_filename):
+    opener = gzip.open if output_filename.endswith('.gz') else open
+    with opener(output_filename, mode='rt', encoding='utf-8', newline='') as output_file:
+        rows = list(csv.reader(io.StringIO(output_file.read())))
+    if rows[0] != event_export_csv.HEADERS:
+        raise AssertionError('No header in the first line of %s.' % output_filename)
+    return [int(row[0]) for row in rows[1:]]
+
+
+# Run write_events as an incremental export does, with the checkpoint loaded from the file next to the output file.
+def export(output_filename, eventids, crash=False):
+    checkpoint = event_export_csv.ExportCheckpoint(output_filename)
+    checkpoint.load()
+    return event_export_csv.write_events(output_filename, iter_rows(eventids, crash), checkpoint)
+
+
+class TestExportCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.output_filename = os.path.join(self.work_dir, 'events.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_round_trip(self):
+        checkpoint = event_export_csv.ExportCheckpoint(self.output_filename)
+        self.assertFalse(checkpoint.load())
+        self.assertIsNone(checkpoint.eventid)
+        checkpoint.save(1042, 1600000042, 4096)
+        checkpoint = event_export_csv.ExportCheckpoint(self.output_filename)
+        self.assertTrue(checkpoint.load())
+        self.assertEqual((checkpoint.eventid, checkpoint.clock, checkpoint.csv_offset), (1042, 1600000042, 4096))
+        self.assertEqual(os.listdir(self.work_dir), ['events.csv.checkpoint'])
+
+
+# Rows are committed every 3 rows, so that a crash leaves rows written after the last commit.
+@mock.patch.object(event_export_csv, 'FLUSH_INTERVAL', 3)
+class TestResume(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.work_dir)
+
+    def test_resume_after_crash(self):
+        output_filename = os.path.join(self.work_dir, 'events.csv')
+        with self.assertRaises(RuntimeError):
+            export(output_filename, range(1, 9), crash=True)
+        # Rows 7 and 8 were written after the last commit.
+        checkpoint = event_export_csv.ExportCheckpoint(output_filename)
+        checkpoint.load()
+        self.assertEqual(checkpoint.eventid, 6)
+        self.assertEqual(read_eventids(output_filename), list(range(1, 9)))
+        # The next run gets the events from the eventid of the checkpoint on, and drops the rows not committed.
+        self.assertEqual(export(output_filename, range(checkpoint.eventid + 1, 11)), 4)
+        self.assertEqual(read_eventids(output_filename), list(range(1, 11)))
+        checkpoint.load()
+        self.assertEqual((checkpoint.eventid, checkpoint.clock), (10, 1600000010))
+        self.assertEqual(checkpoint.csv_offset, os.path.getsize(output_filename))
+
+    def test_resume_without_new_events(self):
+        output_filename = os.path.join(self.work_dir, 'events.csv')
+        export(output_filename, range(1, 5))
+        size = os.path.getsize(output_filename)
+        self.assertEqual(export(output_filename, []), 0)
+        self.assertEqual(read_eventids(output_filename), list(range(1, 5)))
+        self.assertEqual(os.path.getsize(output_filename), size)
+
+    # A compressed file is committed only when it is closed, so a crashed run is dropped as a whole.
+    def test_resume_compressed_after_crash(self):
+        output_filename = os.path.join(self.work_dir, 'events.csv.gz')
+        export(output_filename, range(1, 5))
+        with self.assertRaises(RuntimeError):
+            export(output_filename, range(5, 12), crash=True)
+        checkpoint = event_export_csv.ExportCheckpoint(output_filename)
+        checkpoint.load()
+        self.assertEqual(checkpoint.eventid, 4)
+        export(output_filename, range(checkpoint.eventid + 1, 14))
+        self.assertEqual(read_eventids(output_filename), list(range(1, 14)))
+
+
+class TestIncrementalEventsHistory(unittest.TestCase):
+    def test_params_without_time_from(self):
+        events_history = event_export_csv.EventsHistory('http://127.0.0.1/api_jsonrpc.php', 'token', None,
+                                                        1600090000, 1043, 3600, None, 1, False, True)
+        self.assertEqual(events_history._split_timeframe(), [(None, 1600090000)])
+        event_params = events_history._build_event_params(None, 1600090000)
+        self.assertNotIn('time_from', event_params)
+        self.assertEqual(event_params['eventid_from'], 1043)
+        self.assertEqual(event_params['sortfield'], ['eventid'])
+
+    # An event received late by Zabbix has an older clock than the events before it, but a newer eventid. The events
+    # of the shards are merged by eventid, so that the greatest eventid written is the last one.
+    def test_shards_merged_by_eventid(self):
+        events_history = event_export_csv.EventsHistory('http://127.0.0.1/api_jsonrpc.php', 'token', 1600000000,
+                                                        1600001999, None, 1000, None, 1, False, True)
+        self.assertEqual(events_history._split_timeframe(), [(1600000000, 1600000999), (1600001000, 1600001999)])
+        shard_events = [[{'eventid': '1', 'clock': '1600000100'}, {'eventid': '4', 'clock': '1600000200'}],
+                        [{'eventid': '2', 'clock': '1600001100'}, {'eventid': '3', 'clock': '1600001200'}]]
+        with mock.patch.object(event_export_csv.base_lib, 'api_query_concurrently', return_value=shard_events):
+            self.assertEqual([zbx_event['eventid'] for zbx_event in events_history.get()], ['1', '2', '3', '4'])
+
+    # The resumed run gets the events from the eventid after the checkpoint, whatever their clock.
+    def test_run_export_job_resumes_from_checkpoint(self):
+        work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, work_dir)
+        output_filename = os.path.join(work_dir, 'events.csv')
+        export(output_filename, range(1, 43))
+        checkpoint = event_export_csv.ExportCheckpoint(output_filename)
+        checkpoint.load()
+        export_job = {'output': output_filename, 'type': 'History', 'time_from': 1500000000, 'time_till': 1600000000,
+                      'checkpoint': checkpoint, 'workers': 1, 'shard_size': None, 'shard_events': None,
+                      'incremental': True, 'stream': False, 'columnar_time': False}
+        with mock.patch.object(event_export_csv, 'EventsHistory') as events_history:
+            events_history.return_value.get.return_value = iter([])
+            self.assertEqual(event_export_csv.run_export_job('http://127.0.0.1/api_jsonrpc.php', 'token', (5, 0, 3),
+                                                             export_job), 0)
+        (url, token, time_from, time_till, eventid_from) = events_history.call_args[0][:5]
+        self.assertIsNone(time_from)
+        self.assertEqual(eventid_from, 43)
+        self.assertTrue(events_history.call_args[0][-1])
+        self.assertEqual(read_eventids(output_filename), list(range(1, 43)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_retry_policy.py
+
+"""
+Regression tests of the retry policy of ConnectionWithZabbix: which methods are retried, and which errors (user-023).
+"""
+
+import ssl
+import unittest
+
+import testing_config  # noqa: F401, writes the config of the tests before base_lib loads it.
+from modules import base_lib
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def test_idempotent_methods(self):
+        for method in ('event.get', 'trigger.get', 'problem.get', 'apiinfo.version'):
+            self.assertTrue(base_lib.is_idempotent_method(method), method)
+        for method in ('user.login', 'user.logout', 'event.acknowledge', None):
+            self.assertFalse(base_lib.is_idempotent_method(method), method)
+
+    def test_retry_delay(self):
+        request = base_lib.ConnectionWithZabbix('http://127.0.0.1/api_jsonrpc.php', '{}', 'event.get')
+        self.assertGreaterEqual(request._get_retry_delay(1, TimeoutError('timed out')), 0)
+        # Out of retries.
+        with self.assertRaises(TimeoutError):
+            request._get_retry_delay(100, TimeoutError('timed out'))
+        # A query which changes state is never sent twice.
+        request = base_lib.ConnectionWithZabbix('http://127.0.0.1/api_jsonrpc.php', '{}', 'user.logout')
+        with self.assertRaises(ConnectionResetError):
+            request._get_retry_delay(1, ConnectionResetError())
+
+    def test_permanent_errors_are_not_retried(self):
+        self.assertNotIsInstance(FileNotFoundError(), base_lib.RETRYABLE_ERRORS)
+        self.assertIsInstance(ConnectionRefusedError(), base_lib.RETRYABLE_ERRORS)
+        self.assertIsInstance(TimeoutError(), base_lib.RETRYABLE_ERRORS)
+        request = base_lib.ConnectionWithZabbix('http://127.0.0.1/api_jsonrpc.php', '{}', 'event.get')
+        with self.assertRaises(ssl.SSLCertVerificationError):
+            request._get_retry_delay(1, ssl.SSLCertVerificationError('certificate verify failed'))
+
+
+if __name__ == "__main__":
+    unittest.main()
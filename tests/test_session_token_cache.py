@@ -0,0 +1,70 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_session_token_cache.py
+
+"""
+Regression tests of SessionTokenCache of user: a cached session is reused only with the credential it was opened
+with, and the cache file is readable by the owner only (user-016).
+"""
+
+import json
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+import testing_config  # noqa: F401, writes the config of the tests before base_lib loads it.
+from modules import user
+
+URL = 'http://127.0.0.1/api_jsonrpc.php'
+
+
+class TestSessionTokenCache(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_dir)
+        self.path = os.path.join(self.work_dir, 'token.cache')
+        self.cache = user.SessionTokenCache(self.path)
+
+    def test_reused_with_same_credential(self):
+        self.cache.put(URL, ('Admin', 'zabbix'), 'token-admin')
+        self.assertEqual(self.cache.get(URL, ('Admin', 'zabbix')), 'token-admin')
+        self.assertIsNone(self.cache.get('http://other/api_jsonrpc.php', ('Admin', 'zabbix')))
+        # The password is not kept in clear.
+        with open(self.path, mode='r') as cache_file:
+            self.assertNotIn('zabbix', json.load(cache_file)[URL].values())
+
+    def test_not_reused_by_other_user_or_password(self):
+        self.cache.put(URL, ('Admin', 'zabbix'), 'token-admin')
+        self.assertIsNone(self.cache.get(URL, ('Guest', 'zabbix')))
+        self.assertIsNone(self.cache.get(URL, ('Admin', 'rotated')))
+        # The session of the new login replaces the former one.
+        self.cache.put(URL, ('Admin', 'rotated'), 'token-rotated')
+        self.assertEqual(self.cache.get(URL, ('Admin', 'rotated')), 'token-rotated')
+        self.assertIsNone(self.cache.get(URL, ('Admin', 'zabbix')))
+
+    # An entry of a former version holds the token only, of an unknown user.
+    def test_token_only_entry_ignored(self):
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT, 0o600)
+        with os.fdopen(fd, mode='w') as cache_file:
+            json.dump({URL: 'token-unknown'}, cache_file)
+        self.assertIsNone(self.cache.get(URL, ('Admin', 'zabbix')))
+
+    # A temporary file left by a former run with looser permissions does not pass them to the cache file.
+    def test_owner_only_permission(self):
+        with open(self.path + '.tmp', mode='w'):
+            pass
+        os.chmod(self.path + '.tmp', 0o666)
+        self.cache.put(URL, ('Admin', 'zabbix'), 'token-admin')
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+        self.assertEqual(self.cache.get(URL, ('Admin', 'zabbix')), 'token-admin')
+
+    def test_accessible_by_others_ignored(self):
+        self.cache.put(URL, ('Admin', 'zabbix'), 'token-admin')
+        os.chmod(self.path, 0o644)
+        self.assertIsNone(self.cache.get(URL, ('Admin', 'zabbix')))
+
+
+if __name__ == "__main__":
+    unittest.main()
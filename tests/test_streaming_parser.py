@@ -0,0 +1,93 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_streaming_parser.py
+
+"""
+Regression tests of StreamingResultParser of base_lib, parsing the 'result' of a JSON-RPC response element by element
+as it is read (user-010). Run them from the root of the repository, e.g. python -m pytest tests or
+python -m unittest discover tests
+"""
+
+import io
+import json
+import unittest
+
+import testing_config  # noqa: F401, writes the config of the tests before base_lib loads it.
+from modules import base_lib
+
+
+# The read sizes to parse the responses with, from one byte per read on, so that every value, escape sequence and
+# multibyte UTF-8 character is split across reads somewhere.
+READ_SIZES = (1, 2, 3, 5, 7, 16, 64, 1024, 65536)
+
+
+def parse_result(response_body, read_size):
+    parser = base_lib.StreamingResultParser(io.BytesIO(response_body), read_size)
+    return list(parser.iter_result()), parser
+
+
+class TestStreamingResultParser(unittest.TestCase):
+    def test_result_array(self):
+        result = [{'eventid': str(1000 + index), 'clock': str(1600000000 + index), 'name': 'Problem %d' % index,
+                   'tags': [{'tag': 'type', 'value': 'T%d' % index}], 'acknowledges': []} for index in range(20)]
+        response_body = json.dumps({'jsonrpc': '2.0', 'result': result, 'id': 1}).encode('utf-8')
+        for read_size in READ_SIZES:
+            (items, parser) = parse_result(response_body, read_size)
+            self.assertEqual(items, result, read_size)
+            self.assertEqual(parser.bytes_read, len(response_body))
+
+    # Numbers are the values a truncated buffer can cut into a valid but shorter value, e.g. 123 of 12345.
+    def test_numbers_across_reads(self):
+        result = [12345, 678, -9.5e3, 0, True, None, 'x']
+        response_body = b'{"result": [12345,678 , -9.5e3,0,true,null,"x"] , "id":1}'
+        for read_size in READ_SIZES:
+            self.assertEqual(parse_result(response_body, read_size)[0], result, read_size)
+
+    def test_multibyte_utf8_across_reads(self):
+        result = [{'name': 'Température élevée sur 服务器 \U0001F525', 'host': 'hôte-ü'}, 'Ωmega', '\\"quoted\\"']
+        for ensure_ascii in (True, False):
+            response_body = json.dumps({'jsonrpc': '2.0', 'result': result, 'id': 1},
+                                       ensure_ascii=ensure_ascii).encode('utf-8')
+            for read_size in READ_SIZES:
+                self.assertEqual(parse_result(response_body, read_size)[0], result, (ensure_ascii, read_size))
+
+    def test_result_before_other_members(self):
+        response_body = b'{"result":[1,2],"jsonrpc":"2.0","id":7}'
+        for read_size in READ_SIZES:
+            self.assertEqual(parse_result(response_body, read_size)[0], [1, 2])
+
+    def test_empty_result(self):
+        for response_body in (b'{"jsonrpc":"2.0","result":[],"id":1}', b'{"jsonrpc":"2.0","result":[ ],"id":1}'):
+            for read_size in READ_SIZES:
+                self.assertEqual(parse_result(response_body, read_size)[0], [])
+
+    # A result which is not an array, e.g. of apiinfo.version or countOutput, is yielded as a whole.
+    def test_result_not_array(self):
+        for (result, response_body) in (('5.0.3', b'{"jsonrpc":"2.0","result":"5.0.3","id":1}'),
+                                        ({'userid': '1'}, b'{"jsonrpc":"2.0","result":{"userid":"1"},"id":1}')):
+            for read_size in READ_SIZES:
+                self.assertEqual(parse_result(response_body, read_size)[0], [result])
+
+    def test_error_object(self):
+        response_body = json.dumps({'jsonrpc': '2.0', 'error': {'code': -32602, 'message': 'Invalid params.',
+                                                                'data': 'Session terminated, re-login, please.'},
+                                    'id': 1}).encode('utf-8')
+        for read_size in READ_SIZES:
+            with self.assertRaisesRegex(Exception, 'Got an error from Zabbix'):
+                parse_result(response_body, read_size)
+
+    def test_truncated_body(self):
+        response_body = b'{"jsonrpc":"2.0","result":[{"eventid":"1"},{"eventid":"2"},{"eventid":"3"}],"id":1}'
+        for end in range(1, len(response_body) - 1):
+            for read_size in (1, 7, 65536):
+                with self.assertRaises(ValueError, msg=(end, read_size)):
+                    parse_result(response_body[:end], read_size)
+
+    def test_invalid_body(self):
+        for response_body in (b'[1,2]', b'{"result":[1 2]}', b'{"result" [1]}'):
+            with self.assertRaises(ValueError):
+                parse_result(response_body, 65536)
+
+
+if __name__ == "__main__":
+    unittest.main()
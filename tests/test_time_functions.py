@@ -0,0 +1,37 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_time_functions.py
+
+"""
+Regression tests of the time functions of base_lib, and of the durations of more than a day (user-019).
+"""
+
+import unittest
+
+import testing_config  # noqa: F401, writes the config of the tests before base_lib loads it.
+from modules import base_lib
+
+
+class TestTimeFunctions(unittest.TestCase):
+    # The whole days of a duration used to be dropped.
+    def test_calculate_time_delta_multi_day(self):
+        self.assertEqual(base_lib.calculate_time_delta('1600000000', '1600090037'), 90037)
+        self.assertEqual(base_lib.calculate_time_delta(1600000000, 1600000000 + 3 * 86400), 3 * 86400)
+        self.assertEqual(base_lib.calculate_time_delta(1600000000, 1600000059), 59)
+
+    def test_convert_to_readable_time(self):
+        self.assertEqual(base_lib.convert_to_readable_time(0), '0s')
+        self.assertEqual(base_lib.convert_to_readable_time(59), '59s')
+        self.assertEqual(base_lib.convert_to_readable_time(3600), '1h 0m 0s')
+        self.assertEqual(base_lib.convert_to_readable_time(90037), '1d 1h 0m 37s')
+        self.assertEqual(base_lib.convert_to_readable_time(10 * 86400 + 61), '10d 0h 1m 1s')
+
+    def test_columnar_time_functions(self):
+        durations = base_lib.calculate_time_deltas([1600000000, '1600000000', 1600000000],
+                                                   ['1600090037', None, 1600000045])
+        self.assertEqual(durations, [90037, None, 45])
+        self.assertEqual(base_lib.convert_to_readable_times(durations), ['1d 1h 0m 37s', None, '45s'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_trigger_cache.py
+
+"""
+Regression tests of TriggerCache of trigger: the expiry of entries after the TTL, the eviction of the least recently
+used entries beyond max_entries, and trigger.get called only for the triggers missing from the cache (user-013).
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import testing_config  # noqa: F401, writes the config of the tests before base_lib loads it.
+from modules import base_lib
+from modules import trigger
+
+URL = 'http://127.0.0.1/api_jsonrpc.php'
+PARAMS = {'output': ['triggerid', 'description', 'priority'], 'selectHosts': ['name']}
+
+
+def make_trigger(triggerid):
+    return {'triggerid': triggerid, 'description': 'trigger %s' % triggerid, 'priority': '3'}
+
+
+class TestTriggerCache(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        # Removed after the caches are closed, as the cleanups run in the reverse order.
+        self.addCleanup(shutil.rmtree, self.work_dir)
+        self.path = os.path.join(self.work_dir, 'cache.sqlite')
+        # The clock of the cache, set by the tests.
+        self.now = 1600000000.0
+        patcher = mock.patch.object(trigger, 'time', mock.Mock(time=lambda: self.now))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.params_key = trigger.TriggerCache.build_params_key(PARAMS)
+
+    def _open_cache(self, ttl=3600, max_entries=100):
+        cache = trigger.TriggerCache(self.path, ttl, max_entries)
+        self.addCleanup(cache.close)
+        return cache
+
+    def test_hit_and_miss(self):
+        cache = self._open_cache()
+        cache.put_many(URL, self.params_key, [make_trigger('1'), make_trigger('2')])
+        self.assertEqual(cache.get_many(URL, self.params_key, ['1', '2', '3']),
+                         {'1': make_trigger('1'), '2': make_trigger('2')})
+
+    # The content depends on the URL and the other parameters of trigger.get, but not on the triggerids.
+    def test_keyed_by_url_and_params(self):
+        cache = self._open_cache()
+        cache.put_many(URL, self.params_key, [make_trigger('1')])
+        self.assertEqual(cache.get_many('http://other/api_jsonrpc.php', self.params_key, ['1']), {})
+        other_params_key = trigger.TriggerCache.build_params_key(dict(PARAMS, selectGroups=['name']))
+        self.assertEqual(cache.get_many(URL, other_params_key, ['1']), {})
+        self.assertEqual(trigger.TriggerCache.build_params_key(dict(PARAMS, triggerids=['1', '2'])),
+                         self.params_key)
+
+    def test_ttl(self):
+        cache = self._open_cache(ttl=100)
+        cache.put_many(URL, self.params_key, [make_trigger('1')])
+        self.now += 99
+        self.assertIn('1', cache.get_many(URL, self.params_key, ['1']))
+        # An access does not extend the life of an entry.
+        self.now += 2
+        self.assertEqual(cache.get_many(URL, self.params_key, ['1']), {})
+        # The expired entries are dropped at the next put.
+        cache.put_many(URL, self.params_key, [make_trigger('2')])
+        self.assertEqual(cache._db.execute('SELECT triggerid FROM triggers').fetchall(), [('2',)])
+
+    def test_lru_eviction(self):
+        cache = self._open_cache(max_entries=3)
+        for triggerid in ('1', '2', '3'):
+            self.now += 1
+            cache.put_many(URL, self.params_key, [make_trigger(triggerid)])
+        # Trigger 1 is used again, so trigger 2 is now the least recently used.
+        self.now += 1
+        cache.get_many(URL, self.params_key, ['1'])
+        self.now += 1
+        cache.put_many(URL, self.params_key, [make_trigger('4')])
+        self.assertEqual(sorted(cache.get_many(URL, self.params_key, ['1', '2', '3', '4'])), ['1', '3', '4'])
+
+    def test_kept_across_runs(self):
+        self._open_cache().put_many(URL, self.params_key, [make_trigger('1')])
+        self.assertEqual(self._open_cache().get_many(URL, self.params_key, ['1']), {'1': make_trigger('1')})
+
+    # trigger.get is called only for the triggers missing from the cache, and its results are cached.
+    def test_trigger_get_consults_cache(self):
+        cache = self._open_cache()
+        cache.put_many(URL, self.params_key, [make_trigger('1')])
+        sent_params = []
+
+        def fake_api_query(query):
+            sent_params.append(query.params)
+            return [make_trigger(triggerid) for triggerid in query.params['triggerids']]
+
+        with mock.patch.object(trigger, 'get_trigger_cache', return_value=cache), \
+                mock.patch.object(base_lib.MetaClassForQuery, 'api_query', fake_api_query):
+            query = trigger.TriggerGet(URL, 'token', dict(PARAMS, triggerids=['1', '2', 3]))
+            triggers = query.api_query()
+            self.assertEqual(sorted(the_trigger['triggerid'] for the_trigger in triggers), ['1', '2', '3'])
+            self.assertEqual(sent_params, [dict(PARAMS, triggerids=['2', '3'])])
+            # The params of the query are left as they were.
+            self.assertEqual(query.params['triggerids'], ['1', '2', 3])
+            # All of them are in the cache now.
+            trigger.TriggerGet(URL, 'token', dict(PARAMS, triggerids=['1', '2', '3'])).api_query()
+            self.assertEqual(len(sent_params), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
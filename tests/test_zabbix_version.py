@@ -0,0 +1,71 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : test_zabbix_version.py
+
+"""
+Regression tests of ZabbixVersion of apiinfo: the parse of version strings, the comparison with versions and tuples,
+and the selection of the processing of events by version (user-017).
+"""
+
+import unittest
+from unittest import mock
+
+import testing_config  # noqa: F401, writes the config of the tests before base_lib loads it.
+from modules import apiinfo
+import event_export_csv
+
+
+class TestZabbixVersion(unittest.TestCase):
+    def test_parse(self):
+        for (version_string, version_tuple) in (('5.0.3', (5, 0, 3)), ('6.4', (6, 4, 0)), ('7', (7, 0, 0)),
+                                                ('7.0.0rc1', (7, 0, 0)), ('6.0.10', (6, 0, 10)),
+                                                ('7.2.0alpha2', (7, 2, 0)), ('3.4.15.1', (3, 4, 15))):
+            version = apiinfo.ZabbixVersion(version_string)
+            self.assertEqual(version.as_tuple(), version_tuple, version_string)
+            self.assertEqual(str(version), version_string)
+
+    def test_parse_invalid(self):
+        for version_string in ('', 'abc', 'v5.0.3', None):
+            with self.assertRaises(Exception, msg=version_string):
+                apiinfo.ZabbixVersion(version_string)
+
+    # The versions compare by number, not as strings, e.g. 6.0.10 is above 6.0.9, and 10.0 above 9.0.
+    def test_compare(self):
+        self.assertGreater(apiinfo.ZabbixVersion('6.0.10'), apiinfo.ZabbixVersion('6.0.9'))
+        self.assertGreater(apiinfo.ZabbixVersion('10.0.0'), apiinfo.ZabbixVersion('9.0.0'))
+        self.assertLess(apiinfo.ZabbixVersion('5.2.7'), apiinfo.ZabbixVersion('5.4.0'))
+        self.assertEqual(apiinfo.ZabbixVersion('7.0.0rc1'), apiinfo.ZabbixVersion('7.0.0'))
+
+    # Tuples are padded with zeros, e.g. (5, 4) is 5.4.0.
+    def test_compare_with_tuple(self):
+        version = apiinfo.ZabbixVersion('5.4.0')
+        self.assertTrue(version >= (5, 4))
+        self.assertTrue(version == (5, 4))
+        self.assertFalse(version < (5, 4))
+        self.assertTrue(version < (6, 4))
+        self.assertTrue(apiinfo.ZabbixVersion('6.4.1') >= (6, 4))
+        self.assertTrue(apiinfo.ZabbixVersion('6.2.9') < (6, 4))
+        self.assertTrue(apiinfo.ZabbixVersion('3.4.15') < (4, 0))
+        self.assertEqual(tuple(version), (5, 4, 0))
+        self.assertEqual(hash(version), hash(apiinfo.ZabbixVersion('5.4')))
+
+    # The version is got once per URL by apiinfo.version.
+    def test_get_zabbix_version_once_per_url(self):
+        with mock.patch.dict(apiinfo._zabbix_versions, clear=True), \
+                mock.patch.object(apiinfo.ApiinfoVersion, 'api_query', return_value='6.0.10') as api_query:
+            self.assertEqual(apiinfo.get_zabbix_version('http://zabbix-a/api_jsonrpc.php'), (6, 0, 10))
+            self.assertEqual(apiinfo.get_zabbix_version('http://zabbix-a/api_jsonrpc.php'), (6, 0, 10))
+            self.assertEqual(api_query.call_count, 1)
+            apiinfo.get_zabbix_version('http://zabbix-b/api_jsonrpc.php')
+            self.assertEqual(api_query.call_count, 2)
+
+    def test_select_events_processing(self):
+        for (version_string, processing_class) in (('3.4.15', event_export_csv.EventsProcessingV3),
+                                                   ('4.0.0', event_export_csv.EventsProcessingV4),
+                                                   ('7.0.0rc1', event_export_csv.EventsProcessingV4)):
+            events_processing = event_export_csv.select_events_processing(apiinfo.ZabbixVersion(version_string))
+            self.assertIs(type(events_processing), processing_class, version_string)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File    : testing_config.py
+
+"""
+The config of the tests, to import before any module of the repository, e.g. import testing_config.
+base_lib loads the config file given by ZABBIX_API_CONFIG when it is imported, so the config file is written first,
+based on the one of the repository, logging warnings to a temporary folder only.
+"""
+
+import os
+import sys
+import tempfile
+
+import yaml
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# Write the config file of the tests to work_dir. Return its path.
+def write_test_config(work_dir):
+    with open(os.path.join(REPO_DIR, 'zabbix-api-config.yml'), mode='r') as config_file:
+        config = yaml.load(config_file.read(), Loader=yaml.SafeLoader)
+    config['logger_conf']['log_file_fullname'] = os.path.join(work_dir, 'zabbix-api.log')
+    config['logger_conf']['logging_conf_fullname'] = os.path.join(REPO_DIR, 'zabbix-api-logging.yml')
+    config['logger_conf']['loggers'] = {module_name: 'warning_timedRotatingFile'
+                                        for module_name in config['logger_conf']['loggers']}
+    config_path = os.path.join(work_dir, 'zabbix-api-config.yml')
+    with open(config_path, mode='w') as config_file:
+        yaml.safe_dump(config, config_file)
+    return config_path
+
+
+os.environ.setdefault('ZABBIX_API_CONFIG', write_test_config(tempfile.mkdtemp(prefix='zabbix-api-test-')))
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)